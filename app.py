@@ -1,47 +1,88 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory, abort, redirect, url_for
+from flask import Flask, render_template, request, jsonify, send_from_directory, abort, redirect, url_for, make_response
+from flask.json.provider import DefaultJSONProvider
+from jinja2 import FileSystemBytecodeCache
 from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime, timedelta
 from amadeus import Client
 import requests
+import atexit
 import os
 import json
 import csv
+import gzip
+import hashlib
 import re
 import time
+import math
+import threading
 import unicodedata
+from array import array
+from concurrent.futures import ThreadPoolExecutor, wait
 from dotenv import load_dotenv
-import gspread
-from google.oauth2.service_account import Credentials as SACredentials
+import click
+
+import fare_history
+import jobs
+import leases
+import post_store
+import subscribers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # stdlib json via Flask's default provider
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # pure-Python great-circle fallback
 
 load_dotenv()
 
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that serialises with orjson when it's installed.
+
+    Output parses to the same values as the default provider's: keys are
+    sorted, and dates/datetimes and dataclasses are passed through to the
+    same `default` hook, so dates stay HTTP dates ("Mon, 19 Oct 2026
+    10:00:00 GMT") rather than orjson's ISO-8601. The bytes differ only in
+    being compact and raw UTF-8 instead of ASCII with \\u escapes. Anything
+    orjson can't encode falls back to the stdlib path.
+    """
+
+    def dumps_bytes(self, obj) -> bytes:
+        if orjson is not None:
+            try:
+                option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+                if self.sort_keys:
+                    option |= orjson.OPT_SORT_KEYS
+                return orjson.dumps(obj, default=self.default, option=option)
+            except TypeError:
+                pass
+        return super().dumps(obj).encode('utf-8')
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs or orjson is None:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
+
 app = Flask(__name__, template_folder='templates', static_folder='static')
+app.json = FastJSONProvider(app)
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
-SUBSCRIBERS_FILE = os.path.join(DATA_DIR, 'subscribers.csv')
-
-_sheets_client = None
 
-def _get_sheet():
-    """Return the subscribers Google Sheet worksheet, caching the client."""
-    global _sheets_client
-    creds_json = os.environ.get('GOOGLE_SHEETS_CREDENTIALS')
-    sheet_id   = os.environ.get('GOOGLE_SHEETS_SPREADSHEET_ID')
-    if not creds_json or not sheet_id:
-        return None
-    if _sheets_client is None:
-        info = json.loads(creds_json)
-        scopes = ['https://www.googleapis.com/auth/spreadsheets']
-        creds = SACredentials.from_service_account_info(info, scopes=scopes)
-        _sheets_client = gspread.authorize(creds)
-    spreadsheet = _sheets_client.open_by_key(sheet_id)
-    try:
-        return spreadsheet.worksheet('subscribers')
-    except gspread.WorksheetNotFound:
-        ws = spreadsheet.add_worksheet(title='subscribers', rows=1, cols=4)
-        ws.append_row(['email', 'airport_code', 'airport_name', 'signed_up_at'])
-        return ws
+# ---- Jinja bytecode cache ----
+# Compiled templates are shared on disk across workers and restarts, and
+# templates are only re-checked for changes in development.
+TEMPLATE_CACHE_DIR = os.path.join(DATA_DIR, '.jinja_cache')
+os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+app.config['TEMPLATES_AUTO_RELOAD'] = os.environ.get('FLASK_ENV') == 'development'
+app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)}
 
 # Major airports for SEO landing pages + sitemap
 SEO_AIRPORTS = [
@@ -55,7 +96,7 @@ SEO_AIRPORTS = [
 ]
 
 # ---- Live deals feed ----
-_live_deals_cache = {}  # {country_code: {"data": [], "fetched_at": 0}}
+_live_deals_cache = {}  # {country_code: {"data": [], "body": b"", "fetched_at": 0}}
 LIVE_DEALS_TTL = 3600  # re-fetch every hour
 
 # Kept for backward-compat (used as GB fallback)
@@ -378,6 +419,50 @@ def add_cache_headers(response):
         response.cache_control.public = True
     return response
 
+# ---- HTTP caching for JSON APIs ----
+def _apply_cache_policy(response, etag: str, max_age: int, public: bool = True, vary: tuple = ()):
+    response.set_etag(etag)
+    response.cache_control.max_age = max(0, int(max_age))
+    if public:
+        response.cache_control.public = True
+    else:
+        response.cache_control.private = True
+    for header in vary:
+        response.vary.add(header)
+    return response
+
+def _not_modified(etag: str, max_age: int, public: bool = True, vary: tuple = ()):
+    """Return a bodyless 304 if the client already holds `etag`, else None.
+
+    Checked before the handler does any work, so revalidations cost nothing.
+    """
+    if etag not in request.if_none_match:
+        return None
+    return _apply_cache_policy(app.response_class(status=304), etag, max_age, public, vary)
+
+def _cached_json(payload, etag: str, max_age: int, public: bool = True, vary: tuple = ()):
+    """JSON response with cache headers; `payload` may already be encoded bytes."""
+    if isinstance(payload, bytes):
+        response = app.response_class(payload, mimetype=app.json.mimetype)
+    else:
+        response = jsonify(payload)
+    return _apply_cache_policy(response, etag, max_age, public, vary)
+
+# Pre-encoded bodies for deterministic responses, keyed by ETag.
+# Oldest entries are dropped first once the cap is reached.
+_JSON_BYTES_CACHE = {}
+JSON_BYTES_CACHE_MAX = 2048
+
+def _json_bytes(key: str, build) -> bytes:
+    """Return the cached encoding of build() under `key`, encoding it on first use."""
+    body = _JSON_BYTES_CACHE.get(key)
+    if body is None:
+        body = app.json.dumps_bytes(build())
+        if len(_JSON_BYTES_CACHE) >= JSON_BYTES_CACHE_MAX:
+            _JSON_BYTES_CACHE.pop(next(iter(_JSON_BYTES_CACHE)))
+        _JSON_BYTES_CACHE[key] = body
+    return body
+
 # ---- Force HTTPS in production ----
 @app.before_request
 def redirect_to_https():
@@ -412,7 +497,7 @@ DEFAULT_AIRPORTS = [
 OURAIRPORTS_URL       = "https://davidmegginson.github.io/ourairports-data/airports.csv"
 OURAIRPORTS_CACHE_FILE = os.path.join(DATA_DIR, 'ourairports_cache.csv')
 OURAIRPORTS_CACHE_TTL  = 86400 * 7   # re-download once a week
-_OA_CACHE = {"by_code": {}, "by_country": {}, "all": [], "loaded": False, "fetched_at": 0}
+_OA_CACHE = {"by_code": {}, "by_country": {}, "all": [], "grid": {}, "loaded": False, "fetched_at": 0}
 
 def _load_ourairports() -> dict:
     """Download OurAirports CSV once a week, cache to disk, parse into memory.
@@ -421,6 +506,7 @@ def _load_ourairports() -> dict:
       by_code    – {IATA: airport_dict}   (all airports with IATA codes)
       by_country – {CC: [airport_dict, ...]}  (large+medium only, large first)
       all        – flat list for full-text search
+      grid       – {(lat_cell, lon_cell): [airport_dict, ...]} spatial index (see _airports_within)
     """
     now = time.time()
     if _OA_CACHE["loaded"] and now - _OA_CACHE["fetched_at"] < OURAIRPORTS_CACHE_TTL:
@@ -458,10 +544,16 @@ def _load_ourairports() -> dict:
                 name    = (row.get('name') or '').strip()
                 city    = (row.get('municipality') or '').strip()
                 country = (row.get('iso_country') or '').strip().upper()
+                try:
+                    lat = float(row.get('latitude_deg') or '')
+                    lon = float(row.get('longitude_deg') or '')
+                except ValueError:
+                    lat = lon = None
                 entry = {
                     "code": iata, "label": name, "city": city,
                     "country": country, "type": atype,
                     "name": _display_name(name, iata),
+                    "lat": lat, "lon": lon,
                 }
                 by_code[iata] = entry
                 all_airports.append(entry)
@@ -473,7 +565,8 @@ def _load_ourairports() -> dict:
 
         _OA_CACHE.update({
             "by_code": by_code, "by_country": by_country,
-            "all": all_airports, "loaded": True, "fetched_at": now,
+            "all": all_airports, "grid": _build_airport_grid(all_airports),
+            "loaded": True, "fetched_at": now,
         })
     except Exception:
         _OA_CACHE["loaded"] = True
@@ -481,6 +574,82 @@ def _load_ourairports() -> dict:
 
     return _OA_CACHE
 
+# ---- Nearby airports: spatial grid over OurAirports coordinates ----
+# Airports are bucketed into GRID_CELL_DEG x GRID_CELL_DEG cells, so a radius
+# query only measures the airports in the handful of cells the circle touches.
+GRID_CELL_DEG   = 1.0
+EARTH_RADIUS_KM = 6371.0088
+NEARBY_TYPES    = ('large_airport', 'medium_airport')
+
+def _grid_cell(lat: float, lon: float) -> tuple:
+    total = int(round(360 / GRID_CELL_DEG))
+    return (math.floor(lat / GRID_CELL_DEG), (math.floor(lon / GRID_CELL_DEG) + total // 2) % total - total // 2)
+
+def _build_airport_grid(airports: list) -> dict:
+    grid = {}
+    for a in airports:
+        if a.get("lat") is not None and a.get("lon") is not None:
+            grid.setdefault(_grid_cell(a["lat"], a["lon"]), []).append(a)
+    return grid
+
+def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    h = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+def _grid_cells_within(lat: float, lon: float, km: float):
+    """Grid cells that can contain points within km of (lat, lon)."""
+    dlat = km / 111.0
+    lat_lo, lat_hi = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    # A degree of longitude shrinks towards the poles: size the span for the widest latitude touched
+    min_cos = min(math.cos(math.radians(lat_lo)), math.cos(math.radians(lat_hi)))
+    total = int(round(360 / GRID_CELL_DEG))
+    half = total // 2
+    if min_cos <= 1e-6 or km / (111.0 * min_cos) >= 180:
+        lon_cells = range(-half, half)
+    else:
+        dlon = km / (111.0 * min_cos)
+        lon_cells = {(c + half) % total - half for c in range(
+            math.floor((lon - dlon) / GRID_CELL_DEG), math.floor((lon + dlon) / GRID_CELL_DEG) + 1)}
+    for ilat in range(math.floor(lat_lo / GRID_CELL_DEG), math.floor(lat_hi / GRID_CELL_DEG) + 1):
+        for ilon in lon_cells:
+            yield (ilat, ilon)
+
+def _airports_within(lat: float, lon: float, km: float, types=NEARBY_TYPES) -> list:
+    """[(distance_km, airport_dict)] within km of a point, nearest first."""
+    grid = _load_ourairports().get("grid") or {}
+    hits = []
+    for cell in _grid_cells_within(lat, lon, km):
+        for a in grid.get(cell, ()):
+            if types and a.get("type") not in types:
+                continue
+            d = _haversine_km(lat, lon, a["lat"], a["lon"])
+            if d <= km:
+                hits.append((d, a))
+    hits.sort(key=lambda h: h[0])
+    return hits
+
+def _nearest_airports(lat: float, lon: float, k: int = 5, types=NEARBY_TYPES, max_km: float = 2000) -> list:
+    """k nearest airports to a point, searching outward in growing radii."""
+    km = 100.0
+    while True:
+        hits = _airports_within(lat, lon, km, types)
+        if len(hits) >= k or km >= max_km:
+            return hits[:k]
+        km = min(km * 2, max_km)
+
+def _nearby_origins(code: str, km: float = 150, k: int = 4) -> list:
+    """Other large/medium airports within km of an airport, e.g. GLA for EDI."""
+    origin = _get_airport_index().get(code) or {}
+    if origin.get("lat") is None:
+        return []
+    return [
+        {"code": a["code"], "name": a["name"], "city": a.get("city", ""), "distance_km": round(d)}
+        for d, a in _airports_within(origin["lat"], origin["lon"], km)
+        if a["code"] != code
+    ][:k]
+
 # ---- Local airports cache (offline coverage) ----
 _AIRPORTS_CACHE = {"data": [], "mtime": None}
 
@@ -619,122 +788,469 @@ def load_airport_names(query: str) -> dict:
     except Exception:
         return {}
 
-# ---- Main search page ----
-@app.route('/', methods=['GET', 'POST'])
-def index():
-    flights = []
-    origin_label = ""
-    date = ""
+# ---- Travelpayouts ----
+TRAVELPAYOUTS_LATEST_URL = "https://api.travelpayouts.com/v2/prices/latest"
 
-    form_data = {
-        'trip_type': request.form.get('trip_type', 'oneway'),
-        'passengers': request.form.get('passengers', '1'),
-        'departure_date': request.form.get('departure_date', ''),
-        'return_date': request.form.get('return_date', ''),
-        'origin': request.form.get('origin', ''),
-        'origin_code': request.form.get('origin_code', ''),
-        'currency': request.form.get('currency', 'gbp'),
-        'currency_symbol': request.form.get('currency_symbol', '£'),
-    }
-
-    if request.method == 'POST':
-        origin_raw = (request.form.get('origin') or '').strip()
-        origin_code_hidden = (request.form.get('origin_code') or '').strip().upper()
-        departure_date = request.form.get('departure_date')
-        return_date = request.form.get('return_date')
-        trip_type = request.form.get('trip_type', 'oneway')
-        passengers = request.form.get('passengers', '1')
-
-        form_data.update({
-            'trip_type': trip_type,
-            'passengers': passengers,
-            'departure_date': departure_date,
-            'return_date': return_date,
-            'origin': origin_raw,
-            'origin_code': origin_code_hidden
-        })
-
-        # Determine origin_code + human label (prefer hidden code; frontend now ensures it's set)
-        origin_code = ''
-        if origin_code_hidden and len(origin_code_hidden) == 3 and origin_code_hidden.isalpha():
-            origin_code = origin_code_hidden
-            origin_label = resolve_label_for_code(origin_code)
+def _fetch_latest_prices(origin: str, currency: str, limit: int = 100, timeout: int = 15, **extra):
+    """
+    Raw fares for one origin from Travelpayouts' latest-prices feed.
+    Returns the list of fare dicts, or None if the request failed.
+    """
+    params = {'origin': origin, 'currency': currency, 'token': API_TOKEN, 'limit': limit, **extra}
+    try:
+        r = requests.get(TRAVELPAYOUTS_LATEST_URL, params=params, timeout=timeout)
+        if r.status_code != 200:
+            return None
+        data = r.json().get('data', [])
+    except Exception:
+        return None
+    fare_history.record(origin, currency, data)
+    return data
+
+def _currency_for_airport(code: str) -> str:
+    """Currency code for an airport's country (EUR when unmapped)."""
+    country = _get_airport_index().get(code, {}).get('country', '')
+    return COUNTRY_CURRENCY.get(country, ('eur', '€'))[0]
+
+# ---- Per-origin cheapest-destination index ----
+# Fares for each searched origin are enriched with destination label/city/country
+# once, split domestic/international and sorted by price, so a search is a dict
+# lookup plus a slice. Origins searched recently are refreshed in the background.
+ORIGIN_INDEX_TTL     = 1800        # serve an entry for up to 30 min
+ORIGIN_INDEX_HOT_FOR = 6 * 3600    # drop origins not searched in the last 6 h
+ORIGIN_INDEX_MAX     = 500         # entries kept per worker
+ORIGIN_INDEX_REFRESH_MAX = 20      # upstream rebuilds per refresh pass
+_ORIGIN_INDEX = {}  # {(origin, currency): {"domestic": [], "international": [], "built_at": 0, "last_hit": 0}}
+# Guards _ORIGIN_INDEX and the flex caches below, which _SEARCH_POOL threads and
+# the refresh job share. Held for dict reads and writes only, never across a fetch.
+_FARE_CACHE_LOCK = threading.Lock()
+
+def _build_origin_entry(origin: str, fares: list) -> dict:
+    airport_index = _get_airport_index()
+    origin_country = airport_index.get(origin, {}).get('country', '')
+    domestic, international = [], []
+    for flight in fares:
+        dest_code = flight.get('destination', 'N/A')
+        dest_info = airport_index.get(dest_code, {})
+        dest_country = dest_info.get('country', '')
+        entry = {
+            'destination_code': dest_code,
+            'destination_label': _display_name(dest_info.get('label') or dest_code, dest_code) if dest_info else dest_code,
+            'destination_city': dest_info.get('city', ''),
+            'destination_country': dest_country,
+            'price': flight.get('value', 'N/A'),
+            'num_stops': flight.get('number_of_changes', 0),
+            'depart_date': (flight.get('depart_date') or '')[:10],
+        }
+        if origin_country and dest_country == origin_country:
+            domestic.append(entry)
         else:
-            # fallback behavior (still here as safety)
-            if '(' in origin_raw and ')' in origin_raw:
-                guessed = origin_raw.split('(')[-1].replace(')', '').strip().upper()
-                if len(guessed) == 3 and guessed.isalpha():
-                    origin_code = guessed
-                    origin_label = origin_raw
-            elif len(origin_raw) == 3 and origin_raw.isalpha():
-                origin_code = origin_raw.upper()
-                origin_label = resolve_label_for_code(origin_code)
-            else:
-                # last-resort: try Amadeus keyword
-                airport_names = load_airport_names(origin_raw)
-                if airport_names:
-                    origin_code = list(airport_names.keys())[0]
-                    origin_label = _display_name(airport_names[origin_code], origin_code)
-                else:
-                    origin_code = 'LON'
-                    origin_label = 'London (LON)'
-
-        date = departure_date
-
-        # Travelpayouts fetch — get a large batch then split into domestic/international
-        params = {'origin': origin_code, 'currency': form_data['currency'], 'token': API_TOKEN, 'limit': 100}
+            international.append(entry)
+    by_price = lambda e: e['price'] if isinstance(e['price'], (int, float)) else float('inf')
+    domestic.sort(key=by_price)
+    international.sort(key=by_price)
+    return {"domestic": domestic, "international": international}
+
+def _get_origin_fares(origin: str, currency: str, refresh: bool = False):
+    """Indexed fares for an origin, fetching on a miss. Returns None if nothing is available."""
+    key = (origin, currency)
+    now = time.time()
+    with _FARE_CACHE_LOCK:
+        entry = _ORIGIN_INDEX.get(key)
+        if entry and not refresh and now - entry['built_at'] < ORIGIN_INDEX_TTL:
+            entry['last_hit'] = now
+            return entry
+
+    data = _fetch_latest_prices(origin, currency, limit=100, timeout=15)
+    if data is None:
+        return entry  # serve stale rather than nothing
+
+    fresh = _build_origin_entry(origin, data)
+    fresh.update({"built_at": now, "last_hit": entry['last_hit'] if (entry and refresh) else now})
+    with _FARE_CACHE_LOCK:
+        if key not in _ORIGIN_INDEX and len(_ORIGIN_INDEX) >= ORIGIN_INDEX_MAX:
+            _ORIGIN_INDEX.pop(min(_ORIGIN_INDEX, key=lambda k: _ORIGIN_INDEX[k]['last_hit']))
+        _ORIGIN_INDEX[key] = fresh
+    return fresh
+
+def _refresh_origin_index():
+    """
+    Rebuild entries ahead of their expiry, but only for origins searched again
+    since their last build, most recently searched first and at most
+    ORIGIN_INDEX_REFRESH_MAX per pass. An origin nobody comes back to is
+    refreshed once at most, then left to expire.
+    """
+    now = time.time()
+    due = []
+    with _FARE_CACHE_LOCK:
+        for key, entry in list(_ORIGIN_INDEX.items()):
+            if now - entry['last_hit'] > ORIGIN_INDEX_HOT_FOR:
+                _ORIGIN_INDEX.pop(key, None)
+            elif now - entry['built_at'] > ORIGIN_INDEX_TTL / 2 and entry['last_hit'] > entry['built_at']:
+                due.append((entry['last_hit'], key))
+    for _, key in sorted(due, reverse=True)[:ORIGIN_INDEX_REFRESH_MAX]:
         try:
-            r = requests.get("https://api.travelpayouts.com/v2/prices/latest", params=params, timeout=15)
-            if r.status_code == 200:
-                data = r.json().get('data', [])
-                airport_index = _get_airport_index()
-                origin_info = airport_index.get(origin_code, {})
-                origin_country = origin_info.get('country', '')
+            _get_origin_fares(*key, refresh=True)
+        except Exception as exc:
+            app.logger.warning(f"Origin index refresh failed for {key}: {exc}")
 
-                domestic_flights, international_flights = [], []
+def _booking_url(origin: str, dest: str, depart, return_date, passengers, currency: str) -> str:
+    """Aviasales deep link, e.g. /search/LHR1503BCN1 (one-way) or /search/LHR1503BCN2203."""
+    depart_str = depart.strftime('%d%m')
+    if return_date:
+        search_code = f"{origin}{depart_str}{dest}{return_date.strftime('%d%m')}"
+    else:
+        search_code = f"{origin}{depart_str}{dest}1"
+    return f"https://www.aviasales.com/search/{search_code}?adults={passengers}&marker=617752&currency={currency}"
+
+# ---- Flexible dates: fares-by-date matrix ----
+# For an origin and a window of days, prices[d][offset] holds the cheapest fare
+# to destinations[d] departing on start + offset (inf if none seen). The grid is
+# filled from whole-month Travelpayouts batches, cached per month, so a ±7-day
+# or whole-month search costs at most two upstream calls.
+FLEX_WINDOWS    = {'3': 3, '7': 7}   # form value -> ± days; 'month' = rest of that month
+FLEX_MONTH_TTL  = 3600
+FLEX_DATES_SHOWN = 3
+# Both caches drop expired entries on insert and hold at most ORIGIN_INDEX_MAX.
+_FLEX_MONTH_CACHE = {}  # {(origin, currency, 'YYYY-MM'): {"fares": [], "fetched_at": 0}}
+_FLEX_MATRIX_CACHE = {}  # {(origin, currency, start, days): {"matrix": {}, "built_at": 0}}
+
+def _flex_window(depart, flex_days: str):
+    """(start_date, days) to search for a flex_days form value, or None for exact-date."""
+    today = datetime.utcnow().date()
+    if flex_days == 'month':
+        start = max(depart.replace(day=1), today)
+        next_month = (depart.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return (start, (next_month - start).days) if next_month > start else None
+    spread = FLEX_WINDOWS.get(flex_days)
+    if not spread:
+        return None
+    start = max(depart - timedelta(days=spread), today)
+    end = depart + timedelta(days=spread)
+    return (start, (end - start).days + 1) if end >= start else None
 
-                if not departure_date:
-                    return redirect(url_for('index') + '?error=Please+select+a+departure+date.')
+def _make_room(cache: dict, stamp: str, ttl: float, limit: int = ORIGIN_INDEX_MAX):
+    """Drop expired entries (by their `stamp` time), then the oldest while `cache` is full.
 
-                depart_str = datetime.strptime(departure_date, '%Y-%m-%d').strftime('%d%m')
-                return_str = datetime.strptime(return_date, '%Y-%m-%d').strftime('%d%m') if trip_type == 'roundtrip' and return_date else None
+    Callers hold _FARE_CACHE_LOCK.
+    """
+    now = time.time()
+    for key in [k for k, v in cache.items() if now - v[stamp] >= ttl]:
+        cache.pop(key, None)
+    while len(cache) >= limit:
+        cache.pop(next(iter(cache)))
+
+def _fetch_month_fares(origin: str, currency: str, month: str):
+    """All cached one-way fares from origin departing in month (YYYY-MM), or None."""
+    key = (origin, currency, month)
+    with _FARE_CACHE_LOCK:
+        cached = _FLEX_MONTH_CACHE.get(key)
+    if cached and time.time() - cached['fetched_at'] < FLEX_MONTH_TTL:
+        return cached['fares']
+    fares = _fetch_latest_prices(origin, currency, limit=1000, timeout=15, period_type='month',
+                                 beginning_of_period=f"{month}-01", one_way='true', sorting='price')
+    if fares is None:
+        return cached['fares'] if cached else None
+    with _FARE_CACHE_LOCK:
+        _FLEX_MONTH_CACHE.pop(key, None)
+        _make_room(_FLEX_MONTH_CACHE, 'fetched_at', FLEX_MONTH_TTL)
+        _FLEX_MONTH_CACHE[key] = {"fares": fares, "fetched_at": time.time()}
+    return fares
+
+def _build_fare_matrix(origin: str, currency: str, start, days: int):
+    """Dense fares-by-date grid for origin over [start, start + days). None if nothing was fetched."""
+    months = sorted({(start + timedelta(days=i)).strftime('%Y-%m') for i in range(days)})
+    destinations, index, prices, stops = [], {}, [], []
+    fetched = False
+    for month in months:
+        fares = _fetch_month_fares(origin, currency, month)
+        if fares is None:
+            continue
+        fetched = True
+        for f in fares:
+            dest, price = f.get('destination'), f.get('value')
+            raw = (f.get('depart_date') or '')[:10]
+            if not dest or not isinstance(price, (int, float)) or not raw:
+                continue
+            try:
+                offset = (datetime.strptime(raw, '%Y-%m-%d').date() - start).days
+            except ValueError:
+                continue
+            if not 0 <= offset < days:
+                continue
+            row = index.get(dest)
+            if row is None:
+                row = index[dest] = len(destinations)
+                destinations.append(dest)
+                prices.append(array('d', [math.inf]) * days)
+                stops.append(array('b', [0]) * days)
+            if price < prices[row][offset]:
+                prices[row][offset] = price
+                stops[row][offset] = min(int(f.get('number_of_changes') or 0), 127)
+    if not fetched:
+        return None
+    return {"start": start, "days": days, "destinations": destinations, "prices": prices, "stops": stops}
+
+def _cheapest_dates(matrix: dict, per_destination: int = FLEX_DATES_SHOWN) -> list:
+    """Per destination: the cheapest fare in the window and its best few dates, cheapest first."""
+    start, out = matrix["start"], []
+    for dest, row, row_stops in zip(matrix["destinations"], matrix["prices"], matrix["stops"]):
+        # array('d') hands back floats; Travelpayouts prices are whole numbers
+        best = sorted((int(p) if p.is_integer() else p, i)
+                      for i, p in enumerate(row) if p != math.inf)[:per_destination]
+        if not best:
+            continue
+        out.append({
+            "destination": dest,
+            "value": best[0][0],
+            "number_of_changes": row_stops[best[0][1]],
+            "depart_date": (start + timedelta(days=best[0][1])).isoformat(),
+            "flex_dates": [((start + timedelta(days=i)).isoformat(), p) for p, i in best],
+        })
+    out.sort(key=lambda f: f["value"])
+    return out
+
+def _get_flexible_fares(origin: str, currency: str, start, days: int):
+    """Like _get_origin_fares, but each destination is priced on its cheapest day in the window."""
+    key = (origin, currency, start, days)
+    with _FARE_CACHE_LOCK:
+        cached = _FLEX_MATRIX_CACHE.get(key)
+    if cached and time.time() - cached['built_at'] < FLEX_MONTH_TTL:
+        matrix = cached['matrix']
+    else:
+        matrix = _build_fare_matrix(origin, currency, start, days)
+        if matrix is None:
+            return None
+        with _FARE_CACHE_LOCK:
+            _FLEX_MATRIX_CACHE.pop(key, None)
+            _make_room(_FLEX_MATRIX_CACHE, 'built_at', FLEX_MONTH_TTL)
+            _FLEX_MATRIX_CACHE[key] = {"matrix": matrix, "built_at": time.time()}
+
+    cheapest = _cheapest_dates(matrix)
+    entry = _build_origin_entry(origin, cheapest)
+    flex_by_dest = {f["destination"]: f["flex_dates"] for f in cheapest}
+    for bucket in (entry["domestic"], entry["international"]):
+        for e in bucket:
+            e["flex_dates"] = flex_by_dest.get(e["destination_code"], [])
+    return entry
+
+# ---- Value ranking: price per km ----
+def _great_circle_km(lat1, lon1, lat2, lon2, vectorised: bool = None) -> list:
+    """
+    Haversine distances for equal-length coordinate sequences. vectorised
+    picks NumPy (True) or pure Python (False); by default NumPy is used when
+    it's installed.
+    """
+    if vectorised is None:
+        vectorised = np is not None
+    if vectorised:
+        p1, p2 = np.radians(np.asarray(lat1, dtype=float)), np.radians(np.asarray(lat2, dtype=float))
+        dl = np.radians(np.asarray(lon2, dtype=float) - np.asarray(lon1, dtype=float))
+        h = np.sin((p2 - p1) / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+        return (2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(h)))).tolist()
+    return list(map(_haversine_km, lat1, lon1, lat2, lon2))
+
+def _rank_by_value(origin_code: str, fares: list, vectorised: bool = None) -> list:
+    """
+    Order fares by price per km flown (cheapest per km first), adding
+    distance_km and price_per_km to each. Distances for the whole batch are
+    computed in one call (see _great_circle_km for `vectorised`); fares
+    without coordinates go last in price order.
+    """
+    airport_index = _get_airport_index()
+    located, unlocated = [], []
+    lat1, lon1, lat2, lon2 = [], [], [], []
+    for fare in fares:
+        origin = airport_index.get(fare.get('origin_code') or origin_code) or {}
+        dest = airport_index.get(fare['destination_code']) or {}
+        if None in (origin.get('lat'), dest.get('lat')) or not isinstance(fare['price'], (int, float)):
+            unlocated.append(fare)
+            continue
+        located.append(fare)
+        lat1.append(origin['lat']); lon1.append(origin['lon'])
+        lat2.append(dest['lat']); lon2.append(dest['lon'])
+
+    distances = _great_circle_km(lat1, lon1, lat2, lon2, vectorised) if located else []
+    ranked = [
+        {**fare, 'distance_km': round(km), 'price_per_km': round(fare['price'] / km, 3)}
+        for fare, km in zip(located, distances) if km >= 1
+    ]
+    ranked.sort(key=lambda f: f['price_per_km'])
+    too_close = [fare for fare, km in zip(located, distances) if km < 1]
+    return ranked + sorted(unlocated + too_close, key=lambda f: f['price'] if isinstance(f['price'], (int, float)) else float('inf'))
+
+# ---- Multi-origin search ----
+# Searches every airport in a metro area (or the major airports of a country)
+# at once: origins are fetched concurrently through the per-origin index, then
+# merged so each destination appears once at its cheapest fare.
+METRO_AIRPORTS = {
+    'LON': ['LHR', 'LGW', 'STN', 'LTN', 'LCY', 'SEN'],
+    'NYC': ['JFK', 'EWR', 'LGA'],
+    'PAR': ['CDG', 'ORY', 'BVA'],
+    'MIL': ['MXP', 'LIN', 'BGY'],
+    'ROM': ['FCO', 'CIA'],
+    'BER': ['BER'],
+    'STO': ['ARN', 'BMA', 'NYO'],
+    'IST': ['IST', 'SAW'],
+    'TYO': ['HND', 'NRT'],
+    'OSA': ['KIX', 'ITM'],
+    'CHI': ['ORD', 'MDW'],
+    'WAS': ['IAD', 'DCA', 'BWI'],
+    'BUE': ['EZE', 'AEP'],
+    'SAO': ['GRU', 'CGH', 'VCP'],
+    'MOW': ['SVO', 'DME', 'VKO'],
+    'BKK': ['BKK', 'DMK'],
+}
+_METRO_FOR_AIRPORT = {code: metro for metro, codes in METRO_AIRPORTS.items() for code in codes}
+MULTI_ORIGIN_MAX    = 6     # origins per country-wide search
+MULTI_ORIGIN_BUDGET = 12    # seconds for all origins together
+_SEARCH_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix='origin-search')
+
+def _expand_origins(origin_code: str, scope: str) -> list:
+    """Origins to search for a scope: 'airport' (just this one), 'metro' or 'country'."""
+    if scope == 'metro':
+        metro = origin_code if origin_code in METRO_AIRPORTS else _METRO_FOR_AIRPORT.get(origin_code)
+        if metro:
+            codes = METRO_AIRPORTS[metro]
+            return [origin_code] + [c for c in codes if c != origin_code] if origin_code in codes else list(codes)
+    elif scope == 'country':
+        country = _get_airport_index().get(origin_code, {}).get('country', '')
+        nearby = [a['code'] for a in _load_ourairports()["by_country"].get(country, [])
+                  if a.get('type') == 'large_airport' and a['code'] != origin_code]
+        return [origin_code] + nearby[:MULTI_ORIGIN_MAX - 1]
+    return [origin_code]
+
+def _get_multi_origin_fares(origins: list, fetch, budget: float = MULTI_ORIGIN_BUDGET):
+    """
+    Run fetch(origin) for every origin concurrently and merge the results.
+    Origins that miss the shared budget are left out. Each fare carries the
+    origin_code it departs from. Returns None if no origin answered.
+    """
+    futures = {_SEARCH_POOL.submit(fetch, code): code for code in origins}
+    done, not_done = wait(futures, timeout=budget)
+    for f in not_done:
+        f.cancel()
+
+    best, answered = {}, False
+    origin_set = set(origins)
+    for future in done:
+        try:
+            entry = future.result()
+        except Exception as exc:
+            app.logger.warning(f"Origin search failed for {futures[future]}: {exc}")
+            continue
+        if entry is None:
+            continue
+        answered = True
+        origin = futures[future]
+        for fare in entry['domestic'] + entry['international']:
+            dest = fare['destination_code']
+            if dest in origin_set or not isinstance(fare['price'], (int, float)):
+                continue
+            if dest not in best or fare['price'] < best[dest]['price']:
+                best[dest] = {**fare, 'origin_code': origin}
+    if not answered:
+        return None
 
-                for flight in data:
-                    dest_code = flight.get('destination', 'N/A')
-                    price = flight.get('value', 'N/A')
-                    num_stops = flight.get('number_of_changes', 0)
+    origin_country = _get_airport_index().get(origins[0], {}).get('country', '')
+    ranked = sorted(best.values(), key=lambda e: e['price'])
+    return {
+        "domestic": [e for e in ranked if origin_country and e['destination_country'] == origin_country],
+        "international": [e for e in ranked if not (origin_country and e['destination_country'] == origin_country)],
+    }
 
-                    dest_info = airport_index.get(dest_code, {})
-                    dest_label = _display_name(dest_info.get('label') or dest_code, dest_code) if dest_info else dest_code
-                    dest_city = dest_info.get('city', '')
-                    dest_country = dest_info.get('country', '')
-
-                    if return_str:
-                        search_code = f"{origin_code}{depart_str}{dest_code}{return_str}"
-                    else:
-                        search_code = f"{origin_code}{depart_str}{dest_code}1"
-
-                    booking_url = f"https://www.aviasales.com/search/{search_code}?adults={passengers}&marker=617752&currency={form_data['currency']}"
-
-                    entry = {
-                        'destination_code': dest_code,
-                        'destination_label': dest_label,
-                        'destination_city': dest_city,
-                        'destination_country': dest_country,
-                        'price': price,
-                        'num_stops': num_stops,
-                        'booking_url': booking_url
-                    }
+# ---- Main search page ----
+SEARCH_PROGRESSIVE = os.getenv('SEARCH_PROGRESSIVE', '1') == '1'   # shell first, fares via /search/results
+
+def _search_form_data(values) -> dict:
+    """Search parameters from a form or query-string MultiDict, with the page defaults."""
+    return {
+        'trip_type': values.get('trip_type', 'oneway'),
+        'passengers': values.get('passengers', '1'),
+        'departure_date': values.get('departure_date', ''),
+        'return_date': values.get('return_date', ''),
+        'origin': (values.get('origin') or '').strip(),
+        'origin_code': (values.get('origin_code') or '').strip().upper(),
+        'currency': values.get('currency', 'gbp'),
+        'currency_symbol': values.get('currency_symbol', '£'),
+        'flex_days': values.get('flex_days', '0'),
+        'origin_scope': values.get('origin_scope', 'airport'),
+        'rank_by': values.get('rank_by', 'price'),
+    }
 
-                    if origin_country and dest_country == origin_country:
-                        domestic_flights.append(entry)
-                    else:
-                        international_flights.append(entry)
+def _resolve_origin(origin_code_hidden: str, origin_raw: str) -> tuple:
+    """(origin_code, human label) for the submitted origin, preferring the hidden code."""
+    if origin_code_hidden and len(origin_code_hidden) == 3 and origin_code_hidden.isalpha():
+        return origin_code_hidden, resolve_label_for_code(origin_code_hidden)
+    # fallback behavior (still here as safety)
+    if '(' in origin_raw and ')' in origin_raw:
+        guessed = origin_raw.split('(')[-1].replace(')', '').strip().upper()
+        if len(guessed) == 3 and guessed.isalpha():
+            return guessed, origin_raw
+        return '', ''
+    if len(origin_raw) == 3 and origin_raw.isalpha():
+        return origin_raw.upper(), resolve_label_for_code(origin_raw.upper())
+    # last-resort: try Amadeus keyword
+    airport_names = load_airport_names(origin_raw)
+    if airport_names:
+        code = list(airport_names.keys())[0]
+        return code, _display_name(airport_names[code], code)
+    return 'LON', 'London (LON)'
+
+def _search_flights(origin_code: str, form_data: dict) -> list:
+    """Up to 10 domestic then 10 international bookable fares, or [] if the search fails."""
+    try:
+        depart_dt = datetime.strptime(form_data['departure_date'], '%Y-%m-%d').date()
+        return_dt = (datetime.strptime(form_data['return_date'], '%Y-%m-%d').date()
+                     if form_data['trip_type'] == 'roundtrip' and form_data['return_date'] else None)
+
+        # Cheapest destinations for this origin, pre-split and pre-sorted (see _get_origin_fares)
+        window = _flex_window(depart_dt, form_data['flex_days'])
+        if window:
+            fetch = lambda code: _get_flexible_fares(code, form_data['currency'], *window)
+        else:
+            fetch = lambda code: _get_origin_fares(code, form_data['currency'])
+        origins = _expand_origins(origin_code, form_data['origin_scope'])
+        entry = fetch(origin_code) if len(origins) == 1 else _get_multi_origin_fares(origins, fetch)
+        if entry is None:
+            return []
+        if form_data['rank_by'] == 'value':
+            entry = {bucket: _rank_by_value(origin_code, entry[bucket]) for bucket in ('domestic', 'international')}
+
+        # Up to 10 of each, domestic first
+        flights = []
+        for fare in entry['domestic'][:10] + entry['international'][:10]:
+            out_dt, back_dt = depart_dt, return_dt
+            if window and fare.get('depart_date'):
+                # Flexible mode books the cheapest day, keeping the trip length
+                out_dt = datetime.strptime(fare['depart_date'], '%Y-%m-%d').date()
+                back_dt = return_dt + (out_dt - depart_dt) if return_dt else None
+            booking_url = _booking_url(fare.get('origin_code') or origin_code, fare['destination_code'],
+                                       out_dt, back_dt, form_data['passengers'], form_data['currency'])
+            flights.append({**fare, 'booking_url': booking_url})
+        return flights
+    except Exception:
+        return []
 
-                # Up to 10 of each, domestic first
-                flights = domestic_flights[:10] + international_flights[:10]
-        except Exception:
-            pass
+@app.route('/', methods=['GET', 'POST'])
+def index():
+    flights = []
+    origin_label = ""
+    date = ""
+    results_url = None
+    form_data = _search_form_data(request.form)
+
+    if request.method == 'POST':
+        origin_code, origin_label = _resolve_origin(form_data['origin_code'], form_data['origin'])
+        date = form_data['departure_date']
+        if not date:
+            return redirect(url_for('index') + '?error=Please+select+a+departure+date.')
+
+        if origin_code and SEARCH_PROGRESSIVE:
+            # Send the page now; the browser fetches the fares from /search/results
+            results_url = url_for('search_results', **{**form_data, 'origin_code': origin_code})
+        elif origin_code:
+            flights = _search_flights(origin_code, form_data)
 
     airport_index = _get_airport_index()
     origin_country = airport_index.get(form_data.get('origin_code', ''), {}).get('country', '')
@@ -758,11 +1274,33 @@ def index():
         flights=flights,
         origin_label=origin_label,
         origin_country=origin_country,
+        nearby_origins=_nearby_origins(form_data.get('origin_code', '')),
         date=date,
         form_data=form_data,
         blog_cards=blog_cards,
+        results_url=results_url,
     )
 
+@app.route('/search/results')
+def search_results():
+    """Results fragment for the progressive search page; same parameters as the search form."""
+    form_data = _search_form_data(request.args)
+    origin_code = form_data['origin_code']
+    if not (len(origin_code) == 3 and origin_code.isalpha()) or not form_data['departure_date']:
+        abort(400)
+    flights = _search_flights(origin_code, form_data)
+    origin_country = _get_airport_index().get(origin_code, {}).get('country', '')
+    response = make_response(render_template(
+        '_search_results.html',
+        flights=flights,
+        origin_label=resolve_label_for_code(origin_code),
+        origin_country=origin_country,
+        form_data=form_data,
+    ))
+    response.cache_control.private = True
+    response.cache_control.max_age = 60
+    return response
+
 # ---- Content pages ----
 @app.route('/about')
 def about():
@@ -785,16 +1323,41 @@ def contact():
     return render_template('contact.html')
 
 # ---- Autocomplete API: Amadeus -> local file -> built-in defaults ----
+AIRPORTS_API_MAX_AGE  = 86400  # local-data lookups only change when the dataset does
+AIRPORTS_LIVE_MAX_AGE = 300    # Amadeus-backed lookups, which fall back when it's down
+
 @app.route('/api/airports', methods=['GET'])
 def get_airports():
     """
     Returns items like:
       { "code": "LHR", "label": "Heathrow", "city": "London", "name": "Heathrow (LHR)" }
     Your local airports.json labels may already include (CODE), and we avoid duplicating.
+
+    Answers built only from local data (country top-10, or any query when
+    Amadeus isn't configured) depend on the dataset version alone, so they
+    are ETagged up front, byte-cached and public for a day. Queries that go
+    to Amadeus are ETagged by their body and kept for a few minutes, so a
+    fallback served during an outage doesn't stick.
     """
     q       = (request.args.get('query')   or "").strip()
     country = (request.args.get('country') or "").strip().upper()
 
+    if q and amadeus is not None:
+        body = app.json.dumps_bytes(_search_airports(q, country))
+        etag = hashlib.sha1(body).hexdigest()[:16]
+        return (_not_modified(etag, AIRPORTS_LIVE_MAX_AGE)
+                or _cached_json(body, etag, AIRPORTS_LIVE_MAX_AGE))
+
+    version = _get_airport_dataset()["version"]
+    etag = hashlib.sha1(f"{version}|{q.lower()}|{country}".encode('utf-8')).hexdigest()[:16]
+    not_modified = _not_modified(etag, AIRPORTS_API_MAX_AGE)
+    if not_modified:
+        return not_modified
+    body = _json_bytes(f"airports:{etag}", lambda: _search_airports(q, country))
+    return _cached_json(body, etag, AIRPORTS_API_MAX_AGE)
+
+def _search_airports(q: str, country: str) -> list:
+    """Airport autocomplete results for a query, or popular airports for a country."""
     # No query but country provided → popular airports for that country (OurAirports-first)
     if not q and country:
         oa = _load_ourairports()
@@ -805,13 +1368,13 @@ def get_airports():
                 {"code": c, "label": city, "city": city, "name": _display_name(city, c)}
                 for c, city in (COUNTRY_AIRPORTS.get(country) or COUNTRY_AIRPORTS.get('GB', []))
             ]
-        return jsonify([
+        return [
             {"code": a["code"], "label": a["label"], "city": a.get("city", ""), "name": a["name"]}
             for a in airports_for_country[:10]
-        ])
+        ]
 
     if not q:
-        return jsonify([])
+        return []
 
     results = []
 
@@ -868,7 +1431,74 @@ def get_airports():
             "name": _display_name(a.get("label"), a.get("code"))
         } for a in hits]
 
-    return jsonify(results)
+    return results
+
+# ---- Compact airport dataset for client-side autocomplete ----
+# Large + medium airports from OurAirports, ranked large-first, with a
+# pre-normalised search key so the browser can match without a round trip.
+# Built once per OurAirports refresh and kept gzipped in memory.
+AIRPORT_DATASET_FIELDS = ["code", "label", "city", "country", "rank", "key"]
+_AIRPORT_DATASET = {"version": "", "raw": b"", "gz": b"", "source_fetched_at": None}
+
+def _get_airport_dataset() -> dict:
+    """Return {version, raw, gz} for the compact dataset, rebuilding if OurAirports reloaded."""
+    oa = _load_ourairports()
+    if _AIRPORT_DATASET["raw"] and _AIRPORT_DATASET["source_fetched_at"] == oa["fetched_at"]:
+        return _AIRPORT_DATASET
+
+    TYPE_RANK = {'large_airport': 0, 'medium_airport': 1}
+    ranked = [a for a in oa["all"] if a.get("type") in TYPE_RANK]
+    if not ranked:
+        ranked = [dict(a, type='medium_airport') for a in _load_local_airports() or DEFAULT_AIRPORTS]
+    ranked.sort(key=lambda a: (TYPE_RANK.get(a.get("type"), 2), a["code"]))
+
+    rows = [[
+        a["code"],
+        a.get("label") or a["code"],
+        a.get("city", ""),
+        a.get("country", ""),
+        TYPE_RANK.get(a.get("type"), 2),
+        f"{_normalize(a.get('label'))} {_normalize(a.get('city'))}".strip(),
+    ] for a in ranked]
+
+    body = json.dumps({"fields": AIRPORT_DATASET_FIELDS, "rows": rows},
+                      separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    version = hashlib.sha1(body).hexdigest()[:12]
+    raw = body[:-1] + f',"v":"{version}"}}'.encode('utf-8')
+
+    _AIRPORT_DATASET.update({
+        "version": version,
+        "raw": raw,
+        "gz": gzip.compress(raw, compresslevel=9, mtime=0),
+        "source_fetched_at": oa["fetched_at"],
+    })
+    return _AIRPORT_DATASET
+
+@app.template_global()
+def airport_dataset_url() -> str:
+    """Versioned dataset URL for templates, so the browser can cache it forever."""
+    return url_for('airport_dataset', v=_get_airport_dataset()["version"])
+
+@app.route('/api/airports/dataset', methods=['GET'])
+def airport_dataset():
+    """
+    Serve the compact airport dataset, gzipped when the client accepts it.
+    Requests pinned to the current ?v= are immutable; unpinned ones revalidate via ETag.
+    """
+    ds = _get_airport_dataset()
+    gzipped = 'gzip' in (request.headers.get('Accept-Encoding') or '').lower()
+    resp = app.response_class(ds["gz"] if gzipped else ds["raw"], mimetype='application/json')
+    if gzipped:
+        resp.headers['Content-Encoding'] = 'gzip'
+    resp.headers['Vary'] = 'Accept-Encoding'
+    resp.set_etag(ds["version"] + ('-gz' if gzipped else ''))
+    resp.cache_control.public = True
+    if request.args.get('v') == ds["version"]:
+        resp.cache_control.max_age = 31536000
+        resp.cache_control.immutable = True
+    else:
+        resp.cache_control.max_age = 3600
+    return resp.make_conditional(request)
 
 # ---- SEO landing pages ----
 
@@ -1098,6 +1728,7 @@ def seo_airport(code):
             'currency_symbol': '£',
         },
         seo_page={'code': code, 'label': label, 'city': city},
+        nearby_origins=_nearby_origins(code),
         seo_content=seo_content,
         blog_cards=seo_blog_cards,
     )
@@ -1111,71 +1742,67 @@ def subscribe():
     if not email or '@' not in email or '.' not in email.split('@')[-1]:
         return jsonify({'ok': False, 'error': 'Please enter a valid email address.'}), 400
 
-    # Primary: Brevo
-    brevo_ok = False
-    brevo_api_key = os.environ.get('BREVO_API_KEY')
-    if brevo_api_key:
-        try:
-            payload = {
-                'email': email,
-                'attributes': {
-                    'AIRPORT_CODE': airport_code,
-                    'AIRPORT_NAME': airport_name,
-                },
-                'updateEnabled': True,
-            }
-            resp = requests.post(
-                'https://api.brevo.com/v3/contacts',
-                json=payload,
-                headers={'api-key': brevo_api_key, 'Content-Type': 'application/json'},
-                timeout=8,
-            )
-            brevo_ok = resp.status_code in (201, 204)
-            if not brevo_ok:
-                print(f"[subscribe] Brevo {resp.status_code}: {resp.text}", file=__import__('sys').stderr)
-        except Exception as exc:
-            print(f"[subscribe] Brevo error: {exc}", file=__import__('sys').stderr)
-
-    # Fallback: local CSV
-    if not brevo_ok:
-        row = [email, airport_code, airport_name, datetime.utcnow().isoformat()]
-        os.makedirs(DATA_DIR, exist_ok=True)
-        new_file = not os.path.exists(SUBSCRIBERS_FILE)
-        with open(SUBSCRIBERS_FILE, 'a', newline='', encoding='utf-8') as f:
-            w = csv.DictWriter(f, fieldnames=['email', 'airport_code', 'airport_name', 'signed_up_at'])
-            if new_file:
-                w.writeheader()
-            w.writerow(dict(zip(['email', 'airport_code', 'airport_name', 'signed_up_at'], row)))
+    # Durable local queue; the background flusher syncs to Brevo + Sheets
+    try:
+        subscribers.enqueue(email, airport_code, airport_name)
+    except Exception as exc:
+        app.logger.error(f"Subscribe queue error: {exc}")
+        return jsonify({'ok': False, 'error': 'Something went wrong. Please try again.'}), 503
 
     return jsonify({'ok': True})
 
 # ---- Geo detection API ----
-@app.route('/api/geo')
-def api_geo():
-    """Detect user's country from IP and return relevant airports + currency."""
+# Country header set by the CDN in front of us (e.g. Cloudflare's CF-IPCountry).
+# When present we skip the ipapi.co lookup and let shared caches key on it.
+GEO_COUNTRY_HEADER = os.getenv('GEO_COUNTRY_HEADER', 'CF-IPCountry')
+
+def _detect_country() -> tuple:
+    """Return (country, from_header) for the current request."""
+    header_country = (request.headers.get(GEO_COUNTRY_HEADER) or '').strip().upper()
+    if len(header_country) == 2 and header_country.isalpha():
+        return header_country, True
+
     forwarded_for = request.headers.get('X-Forwarded-For', '')
     client_ip = forwarded_for.split(',')[0].strip() if forwarded_for else request.remote_addr
 
     # Localhost / private ranges → default to GB
     if not client_ip or client_ip in ('127.0.0.1', '::1') or client_ip.startswith('192.168.') or client_ip.startswith('10.'):
-        country = 'GB'
-    else:
-        # Check server-side geo cache
-        cached = _geo_cache.get(client_ip)
-        if cached and time.time() - cached['fetched_at'] < GEO_CACHE_TTL:
-            country = cached['country']
-        else:
-            country = 'GB'  # safe default
-            try:
-                r = requests.get(f'https://ipapi.co/{client_ip}/json/', timeout=3)
-                if r.status_code == 200:
-                    data = r.json()
-                    detected = data.get('country_code', 'GB')
-                    if detected and len(detected) == 2:
-                        country = detected.upper()
-                _geo_cache[client_ip] = {'country': country, 'fetched_at': time.time()}
-            except Exception:
-                pass
+        return 'GB', False
+
+    # Check server-side geo cache
+    cached = _geo_cache.get(client_ip)
+    if cached and time.time() - cached['fetched_at'] < GEO_CACHE_TTL:
+        return cached['country'], False
+
+    country = 'GB'  # safe default
+    try:
+        r = requests.get(f'https://ipapi.co/{client_ip}/json/', timeout=3)
+        if r.status_code == 200:
+            data = r.json()
+            detected = data.get('country_code', 'GB')
+            if detected and len(detected) == 2:
+                country = detected.upper()
+        _geo_cache[client_ip] = {'country': country, 'fetched_at': time.time()}
+    except Exception:
+        pass
+    return country, False
+
+@app.route('/api/geo')
+def api_geo():
+    """Detect user's country from IP and return relevant airports + currency."""
+    country, from_header = _detect_country()
+
+    # Keyed on the CDN country header, the answer is shareable; keyed on the
+    # client IP it is only safe for the browser's own cache.
+    policy = {
+        'max_age': GEO_CACHE_TTL,
+        'public': from_header,
+        'vary': (GEO_COUNTRY_HEADER,) if from_header else ('X-Forwarded-For',),
+    }
+    etag = hashlib.sha1(f"{country}|{_get_airport_dataset()['version']}".encode('utf-8')).hexdigest()[:16]
+    not_modified = _not_modified(etag, **policy)
+    if not_modified:
+        return not_modified
 
     currency_code, symbol = COUNTRY_CURRENCY.get(country, ('eur', '€'))
     # Top airports for this country via OurAirports, fall back to hardcoded list
@@ -1187,12 +1814,13 @@ def api_geo():
         fallback = COUNTRY_AIRPORTS.get(country, COUNTRY_AIRPORTS['GB'])
         top_airport_code = fallback[0][0] if fallback else 'LHR'
 
-    return jsonify({
+    body = _json_bytes(f"geo:{etag}", lambda: {
         'country': country,
         'currency': currency_code,
         'symbol': symbol,
         'top_airport': top_airport_code,
     })
+    return _cached_json(body, etag, **policy)
 
 
 # ---- Live deals API ----
@@ -1203,7 +1831,10 @@ def api_live_deals():
     now = time.time()
     cached = _live_deals_cache.get(country)
     if cached and cached['data'] and now - cached['fetched_at'] < LIVE_DEALS_TTL:
-        return jsonify(cached['data'])
+        # Fresh cache entry: clients may keep it until it would be re-fetched here
+        etag = f"{country}-{int(cached['fetched_at'])}"
+        max_age = LIVE_DEALS_TTL - (now - cached['fetched_at'])
+        return _not_modified(etag, max_age) or _cached_json(cached['body'], etag, max_age)
 
     if not API_TOKEN:
         return jsonify([])
@@ -1229,19 +1860,8 @@ def api_live_deals():
 
     for origin_code, origin_city in origins:
         try:
-            params = {
-                'origin': origin_code,
-                'currency': currency_code,
-                'token': API_TOKEN,
-                'limit': 30,
-                'sorting': 'price',
-            }
-            r = requests.get(
-                "https://api.travelpayouts.com/v2/prices/latest",
-                params=params, timeout=8
-            )
-            if r.status_code == 200:
-                data = r.json().get('data', [])
+            data = _fetch_latest_prices(origin_code, currency_code, limit=30, timeout=8, sorting='price')
+            if data is not None:
                 if not data:
                     continue
 
@@ -1291,7 +1911,9 @@ def api_live_deals():
             pass
 
     if results:
-        _live_deals_cache[country] = {'data': results, 'fetched_at': now}
+        body = app.json.dumps_bytes(results)
+        _live_deals_cache[country] = {'data': results, 'body': body, 'fetched_at': now}
+        return _cached_json(body, f"{country}-{int(now)}", LIVE_DEALS_TTL)
 
     return jsonify(results)
 
@@ -1426,61 +2048,107 @@ def page_not_found(e):
 
 # ---- Weekly blog scheduler ----
 # Runs every Monday at 08:00 server time.
-# The lock file in blog_generator prevents duplicate runs across gunicorn workers.
+# Every worker schedules it, so all blog generation (scheduled, admin, startup)
+# runs under one cross-worker lease; the losers skip and can read the winner's result.
+BLOG_LEASE = 'blog-generation'
+
+def _run_blog_job(job: str, fn):
+    """Run fn() while holding the blog lease. Returns its result, or None if another worker holds it."""
+    lease = leases.acquire(BLOG_LEASE)
+    if lease is None:
+        app.logger.info(f"Blog job '{job}' skipped: generation is already running in another worker")
+        return None
+    with lease:
+        started = time.time()
+        result = fn()
+        lease.release({
+            "job": job,
+            "result": result,
+            "seconds": round(time.time() - started, 1),
+            "finished_at": datetime.now().isoformat(),
+        })
+    if result:
+        # Save new posts so they survive Render redeploys, on the job queue rather than here.
+        # A persist already running may have listed the changed files before these were written.
+        jobs.enqueue('persist-posts', dedupe_running=False)
+    return result
+
+def _weekly_blog_job(date: str = ''):
+    import blog_generator
+    return _run_blog_job('weekly', blog_generator.run_next)
+
+def _bulk_blog_job(n: int, force: bool = False):
+    import blog_generator
+    return _run_blog_job('admin', lambda: blog_generator.run_bulk(n=n, force=force))
+
+jobs.register('blog-weekly', _weekly_blog_job)
+jobs.register('blog-bulk', _bulk_blog_job)
+jobs.register('persist-posts', post_store.persist)
+
 def _scheduled_blog_run():
+    # Every worker's scheduler fires, and not all at once: a worker whose
+    # scheduler runs late could otherwise queue the date again after the first
+    # run finished. once=True dedupes against finished jobs too.
     try:
-        import blog_generator
-        blog_generator.run_next()
-        # Auto-commit any new blog posts so they survive Render redeploys
-        import subprocess
-        result = subprocess.run(
-            ['git', 'add', 'data/blog/'],
-            cwd=os.path.dirname(__file__), capture_output=True
-        )
-        if result.returncode == 0:
-            subprocess.run(
-                ['git', 'commit', '-m', 'Auto-generated weekly blog post'],
-                cwd=os.path.dirname(__file__), capture_output=True
-            )
+        jobs.enqueue('blog-weekly', {'date': datetime.now().strftime('%Y-%m-%d')}, once=True)
     except Exception as exc:
         app.logger.error(f"Blog scheduler error: {exc}")
 
+# ---- Daily price alerts ----
+# One worker claims each day's run inside price_alerts, so every worker can schedule it.
+def _scheduled_price_alerts():
+    try:
+        import price_alerts
+        price_alerts.run(fare_source=_fetch_latest_prices, currency_for=_currency_for_airport)
+    except Exception as exc:
+        app.logger.error(f"Price alert job error: {exc}")
+
+def _scheduled_fare_compaction():
+    try:
+        fare_history.compact()
+    except Exception as exc:
+        app.logger.error(f"Fare history compaction error: {exc}")
+
 def _startup_blog_generate():
     """
     Run on startup: if data/blog/ has no posts (e.g. after a fresh Render deploy
     wiped the ephemeral filesystem), regenerate the most relevant article so the
-    homepage doesn't sit empty.  Runs in a background thread so it doesn't delay
-    the server coming up.
+    homepage doesn't sit empty.  Queued as a job so it doesn't delay the server
+    coming up, and every worker's request collapses into one.
     """
-    import threading, time
-    def _run():
-        time.sleep(5)   # let the server finish starting before hitting the API
-        try:
-            import blog_generator
-            posts = blog_generator._published_slugs()
-            priority = [
-                "easter-flight-deals-uk-2026",
-                "summer-holidays-cheap-flights-uk",
-                "uk-bank-holiday-flight-deals",
-                "school-break-flights-uk-guide",
-                "september-christmas-flight-deals-uk",
-                # US market priority posts
-                "cheap-flights-spring-break-us",
-                "memorial-day-weekend-flights-us",
-                "cheap-domestic-flights-us-guide",
-                "cheap-flights-from-nyc-us",
-                "budget-airlines-us-guide",
-            ]
-            missing = [s for s in priority if s not in posts]
-            if missing:
-                app.logger.info(f"Generating {len(missing)} priority blog post(s) on startup: {missing}")
-                blog_generator.run_bulk(n=len(missing))
-            elif not posts:
-                app.logger.info("data/blog/ is empty — generating up to 10 posts on startup")
-                blog_generator.run_bulk(n=10)
-        except Exception as exc:
-            app.logger.error(f"Startup blog generation error: {exc}")
-    threading.Thread(target=_run, daemon=True).start()
+    try:
+        jobs.enqueue('blog-startup')
+    except Exception as exc:
+        app.logger.error(f"Startup blog generation error: {exc}")
+
+def _startup_blog_job():
+    def _generate():
+        import blog_generator
+        posts = blog_generator.post_index(refresh=True)
+        priority = [
+            "easter-flight-deals-uk-2026",
+            "summer-holidays-cheap-flights-uk",
+            "uk-bank-holiday-flight-deals",
+            "school-break-flights-uk-guide",
+            "september-christmas-flight-deals-uk",
+            # US market priority posts
+            "cheap-flights-spring-break-us",
+            "memorial-day-weekend-flights-us",
+            "cheap-domestic-flights-us-guide",
+            "cheap-flights-from-nyc-us",
+            "budget-airlines-us-guide",
+        ]
+        missing = [s for s in priority if s not in posts]
+        if missing:
+            app.logger.info(f"Generating {len(missing)} priority blog post(s) on startup: {missing}")
+            return blog_generator.run_bulk(n=len(missing))
+        elif not posts:
+            app.logger.info("data/blog/ is empty — generating up to 10 posts on startup")
+            return blog_generator.run_bulk(n=10)
+        return 0
+    return _run_blog_job('startup', _generate)
+
+jobs.register('blog-startup', _startup_blog_job)
 
 
 @app.route('/admin/generate-posts')
@@ -1497,28 +2165,189 @@ def admin_generate_posts():
     n = min(int(request.args.get('n', 3)), 10)
     force = request.args.get('force', '').lower() == 'true'
 
-    import threading
-    def _run():
-        try:
-            import blog_generator
-            blog_generator.run_bulk(n=n, force=force)
-        except Exception as exc:
-            app.logger.error(f"Admin generate-posts error: {exc}")
-    threading.Thread(target=_run, daemon=True).start()
+    job_id, created = jobs.enqueue('blog-bulk', {'n': n, 'force': force})
+    return jsonify({
+        "status": "queued" if created else "already queued",
+        "job_id": job_id,
+        "status_url": url_for('admin_job_status', job_id=job_id),
+        "n": n,
+        "force": force,
+    }), 202
+
+@app.route('/admin/jobs/<int:job_id>')
+def admin_job_status(job_id):
+    """
+    Status of a background job (pending / running / done / failed) with its result.
+    Usage: /admin/jobs/42?token=YOUR_API_TOKEN
+    """
+    token = request.args.get('token', '')
+    if not API_TOKEN or token != API_TOKEN:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(job)
 
-    return jsonify({"status": "started", "n": n, "force": force})
+@app.route('/admin/generate-posts/status')
+def admin_generate_posts_status():
+    """
+    Blog generations in flight, with streaming progress per post.
+    Usage: /admin/generate-posts/status?token=YOUR_API_TOKEN
+    """
+    token = request.args.get('token', '')
+    if not API_TOKEN or token != API_TOKEN:
+        return jsonify({"error": "Unauthorized"}), 401
 
-# Only start scheduler in the real process (not in Werkzeug's reloader watcher)
-if not (app.debug and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'):
+    import blog_generator
+    return jsonify({
+        "in_progress": blog_generator.generation_progress(),
+        "lease": leases.status(BLOG_LEASE),
+    })
+
+@app.cli.command('bench-json')
+@click.option('--n', default=5000, show_default=True, help='Encodes per payload.')
+def bench_json(n):
+    """Micro-benchmark JSON encoding of each API payload."""
+    import timeit
+    payloads = {
+        'airports': _search_airports('', 'GB'),
+        'live-deals': [
+            {'route': f"{city} \u2192 Barcelona", 'price': 29 + i, 'symbol': '£', 'date': 'Fri 14 Mar'}
+            for i, (_, city) in enumerate(LIVE_DEAL_ORIGINS)
+        ],
+        'geo': {'country': 'GB', 'currency': 'gbp', 'symbol': '£', 'top_airport': 'LHR'},
+    }
+    click.echo(f"provider: {'orjson' if orjson else 'stdlib'}  ({n} iterations, µs per call)")
+    click.echo(f"{'PAYLOAD':<12} {'STDLIB':>8} {'PROVIDER':>9} {'CACHED':>8}")
+    for name, obj in payloads.items():
+        _JSON_BYTES_CACHE.pop(f"bench:{name}", None)
+        stdlib = timeit.timeit(lambda: json.dumps(obj, sort_keys=True).encode('utf-8'), number=n)
+        provider = timeit.timeit(lambda: app.json.dumps_bytes(obj), number=n)
+        cached = timeit.timeit(lambda: _json_bytes(f"bench:{name}", lambda: obj), number=n)
+        click.echo(f"{name:<12} {stdlib / n * 1e6:>8.2f} {provider / n * 1e6:>9.2f} {cached / n * 1e6:>8.2f}")
+        _JSON_BYTES_CACHE.pop(f"bench:{name}", None)
+
+@app.cli.command('bench-nearby')
+@click.option('--k', default=5, show_default=True, help='Neighbours per query.')
+@click.option('--n', default=10000, show_default=True, help='Random query points.')
+def bench_nearby(k, n):
+    """Benchmark k-nearest airport queries over the full OurAirports dataset."""
+    import random, timeit
+    oa = _load_ourairports()
+    located = [a for a in oa["all"] if a.get("lat") is not None]
+    if not located:
+        raise click.ClickException("OurAirports data not available")
+    rng = random.Random(0)
+    points = [(a["lat"], a["lon"]) for a in rng.choices(located, k=n)]
+    it = iter(points * 2)
+    grid_s = timeit.timeit(lambda: _nearest_airports(*next(it), k=k), number=n)
+    sample = points[:200]
+    brute_s = timeit.timeit(
+        lambda: [sorted(((_haversine_km(lat, lon, a["lat"], a["lon"]), a["code"]) for a in located))[:k]
+                 for lat, lon in sample], number=1)
+    click.echo(f"{len(located)} airports with coordinates, {len(oa['grid'])} grid cells")
+    click.echo(f"grid  k={k}: {grid_s / n * 1e3:.3f} ms/query over {n} queries")
+    click.echo(f"brute k={k}: {brute_s / len(sample) * 1e3:.3f} ms/query over {len(sample)} queries")
+
+@app.cli.command('bench-ranking')
+@click.option('--n', default=5000, show_default=True, help='Synthetic fares per batch.')
+@click.option('--runs', default=20, show_default=True, help='Batches to time.')
+def bench_ranking(n, runs):
+    """Benchmark price-per-km ranking on synthetic fares, NumPy vs pure Python."""
+    import random, timeit
+    oa = _load_ourairports()
+    located = [a["code"] for a in oa["all"] if a.get("lat") is not None]
+    if not located:
+        raise click.ClickException("OurAirports data not available")
+    rng = random.Random(0)
+    origin = 'LHR' if 'LHR' in _get_airport_index() else located[0]
+    fares = [{'destination_code': code, 'price': rng.randint(20, 900)} for code in rng.choices(located, k=n)]
+
+    timings, orders = {}, {}
+    for label, vectorised in (('numpy', True), ('python', False)):
+        if vectorised and np is None:
+            continue
+        orders[label] = [f['destination_code'] for f in _rank_by_value(origin, fares, vectorised)]
+        timings[label] = timeit.timeit(lambda: _rank_by_value(origin, fares, vectorised), number=runs) / runs
+    for label, secs in timings.items():
+        click.echo(f"{label:<6} {n} fares: {secs * 1e3:.2f} ms/batch over {runs} runs")
+    if len(orders) == 2:
+        click.echo(f"orders match: {orders['numpy'] == orders['python']}")
+
+@app.cli.command('bench-cold-start')
+@click.option('--runs', default=3, show_default=True, help='Fresh processes to time.')
+def bench_cold_start(runs):
+    """Time a fresh process from import to the first rendered / response."""
+    import subprocess, sys
+    script = (
+        "import time; t0 = time.perf_counter(); import app; t1 = time.perf_counter(); "
+        "r = app.app.test_client().get('/', base_url='https://localhost'); t2 = time.perf_counter(); "
+        "print(f'{r.status_code} {(t1 - t0) * 1000:.1f} {(t2 - t1) * 1000:.1f}')"
+    )
+    click.echo(f"{'RUN':<5} {'STATUS':<7} {'IMPORT ms':>10} {'FIRST / ms':>11}")
+    for i in range(1, runs + 1):
+        out = subprocess.run([sys.executable, '-c', script], cwd=app.root_path,
+                             capture_output=True, text=True)
+        status, import_ms, first_ms = (out.stdout.strip().splitlines() or ['ERR - -'])[-1].split()
+        click.echo(f"{i:<5} {status:<7} {import_ms:>10} {first_ms:>11}")
+
+def _precompile_templates():
+    """Compile every template up front so no request pays for it (and the bytecode cache is warm)."""
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        try:
+            app.jinja_env.get_template(name)
+        except Exception as exc:
+            app.logger.warning(f"Template precompile failed for {name}: {exc}")
+
+_precompile_templates()
+
+# ---- Background work ----
+# The scheduler, subscriber flusher and job consumer run only in server
+# processes. Gunicorn workers start them from gunicorn.conf.py once the app is
+# loaded and stop them on exit; `python app.py` starts them in the reloaded
+# child. A plain import (flask CLI commands, benchmark subprocesses) starts
+# nothing, so it can't hold the job-consumer lease or claim a job it won't
+# live to finish. Set RUN_BACKGROUND=1 to start them at import under another server.
+_scheduler = None
+_background_started = False
+
+def start_background():
+    global _scheduler, _background_started
+    if _background_started:
+        return
+    _background_started = True
     try:
         from apscheduler.schedulers.background import BackgroundScheduler
         _scheduler = BackgroundScheduler(daemon=True)
         _scheduler.add_job(_scheduled_blog_run, 'cron', day_of_week='mon', hour=8, minute=0)
+        _scheduler.add_job(_scheduled_price_alerts, 'cron', hour=6, minute=30)
+        _scheduler.add_job(_scheduled_fare_compaction, 'cron', hour=3, minute=15)
+        _scheduler.add_job(_refresh_origin_index, 'interval', minutes=5)
         _scheduler.start()
     except ImportError:
         pass  # APScheduler not installed — run blog_generator.py manually or via cron
+    subscribers.start_flusher()
+    jobs.start_consumer()
+    atexit.register(stop_background)
     # Startup auto-generation disabled — posts are written manually as JSON files
     # _startup_blog_generate()
 
+def stop_background():
+    """Stop scheduling and hand the job-consumer lease to another worker."""
+    global _background_started
+    if not _background_started:
+        return
+    _background_started = False
+    if _scheduler is not None and _scheduler.running:
+        _scheduler.shutdown(wait=False)
+    jobs.stop_consumer()
+
+if os.environ.get('RUN_BACKGROUND') == '1':
+    start_background()
+
 if __name__ == '__main__':
+    # Only in the real process, not in Werkzeug's reloader watcher
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background()
     app.run(debug=True)
@@ -11,16 +11,28 @@ CLI usage:
     python blog_generator.py --force    # regenerate even if recent
     python blog_generator.py --list     # show topic queue + status
     python blog_generator.py --topic march-flight-deals-uk  # specific topic
+    python blog_generator.py --bulk 10 --workers 4          # 10 posts, 4 at a time
+    python blog_generator.py --batch                        # all due topics as one batch job
+    python blog_generator.py --force --no-cache             # skip replaying cached model output
+    python blog_generator.py --cache-check                  # prompt-cache prefix size + a cache read
+    python blog_generator.py --plan --per-week 2            # next quarter's picks
+    python blog_generator.py --simulate                     # a year of weekly picks
 
 Called automatically by APScheduler inside app.py every Monday at 08:00.
 """
 
 import argparse
+import hashlib
+import itertools
 import json
 import os
+import random
+import re
 import sys
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
 
 import anthropic
 from dotenv import load_dotenv
@@ -36,6 +48,35 @@ os.makedirs(BLOG_DIR, exist_ok=True)
 # How old a post must be (in days) before it gets refreshed with new content
 STALE_DAYS = 340
 
+# ── API concurrency / retries ────────────────────────────────────────────────
+MODEL         = "claude-sonnet-4-6"
+MAX_TOKENS    = 4000
+BULK_WORKERS  = int(os.environ.get('BLOG_BULK_WORKERS', '4'))
+MAX_ATTEMPTS  = 5          # per post, including the first try
+BACKOFF_BASE  = 2.0        # seconds, doubled each attempt (plus jitter)
+BACKOFF_MAX   = 60.0
+RETRY_STATUS  = {408, 409, 429, 500, 502, 503, 504, 529}
+FATAL_STATUS  = {400, 401, 403, 404, 413}   # same result for every topic: stop the run
+
+# Streamed generations are checked as tokens arrive and retried on bad output
+STREAM_GENERATION   = os.environ.get('BLOG_STREAM', '1') == '1'
+GENERATION_ATTEMPTS = 3        # per post, for malformed / truncated / empty output
+CACHE_MIN_TOKENS    = 1024     # shortest prefix the API will cache; see --cache-check
+PROGRESS_FILE       = os.path.join(_HERE, 'data', '.blog_progress.json')
+PROGRESS_INTERVAL   = 1.0      # seconds between progress file writes
+PROGRESS_MAX_AGE    = 600      # entries older than this are treated as dead
+
+# ── Generation cache (raw model output keyed by a hash of the full request) ──
+GEN_CACHE_DIR       = os.path.join(_HERE, 'data', '.gen_cache')
+GEN_CACHE_MAX_BYTES = int(os.environ.get('BLOG_GEN_CACHE_MAX_MB', '50')) * 1024 * 1024
+USE_GEN_CACHE       = True     # --no-cache turns off replays (fresh output is still stored)
+
+# ── Message Batches (offline regeneration) ───────────────────────────────────
+BATCH_STATE_FILE   = os.path.join(_HERE, 'data', '.blog_batch.json')
+BATCH_POLL_SECONDS = 60
+BATCH_POLL_ERRORS  = 10        # poll failures in a row before the batch is given up
+BATCH_MAX_HOURS    = 26        # the API expires batches at 24h; one still running after this is stuck
+
 # ── Static blog posts already in app.py (for related-links cross-linking) ───
 STATIC_POSTS = [
     ("cheapest-flights-from-london",     "Cheapest places to fly from London"),
@@ -1250,10 +1291,15 @@ CRITICAL STYLE RULES — follow every one precisely:
 
 Output: Return ONLY valid JSON. No markdown fences, no code blocks, no explanation text."""
 
+# The user prompts are static so they can be cached along with the persona;
+# the per-topic details go in TOPIC_PROMPT, sent after them.
+# NOTE: persona + user prompt come to about 3,800-4,000 characters (roughly
+# 900-1,000 tokens), which is below CACHE_MIN_TOKENS. The API accepts the
+# cache breakpoint but caches nothing until this prefix grows; check with
+# --cache-check. Growing it changes what every post says, so that is a
+# prompt-content change, not a caching one.
 USER_PROMPT = """\
-Write a travel blog post about: {prompt_topic}
-
-Today is {month_name} {year}.
+Write a travel blog post about the topic brief at the end of this message.
 
 Write exactly 4 sections. Each section has 3-5 SHORT paragraphs (2-4 sentences each).
 Every destination or route you mention must include a specific price, the airline, and the UK airport.
@@ -1267,21 +1313,19 @@ checking. easyJet fly from Gatwick from around £49 one-way, and mid-March tempe
 low 20s. My mate went last year for under £280 total including a central Airbnb."
 
 Return ONLY this JSON (no markdown, no code fences, nothing else before or after):
-{{
+{
   "title": "SEO title with specific route or price angle, max 70 chars",
   "subtitle": "one punchy line with a specific claim or price, max 90 chars",
   "airport_names": "which UK airports this post covers, concise",
   "meta": "SEO meta description 145-160 chars — mention specific destinations and price ranges",
   "sections": [
-    {{"heading": "section heading", "body": "short punchy paragraphs as a single HTML string, separated with <br><br>"}},
-    {{"heading": "section heading", "body": "..."}},
-    {{"heading": "section heading", "body": "..."}},
-    {{"heading": "section heading", "body": "..."}}
+    {"heading": "section heading", "body": "short punchy paragraphs as a single HTML string, separated with <br><br>"},
+    {"heading": "section heading", "body": "..."},
+    {"heading": "section heading", "body": "..."},
+    {"heading": "section heading", "body": "..."}
   ],
-  "cta_airport": "{cta_airport}"
-}}
-
-Topic brief: {prompt_topic}"""
+  "cta_airport": "the CTA airport code given in the brief"
+}"""
 
 # US persona
 US_SYSTEM_PROMPT = """\
@@ -1316,9 +1360,7 @@ CRITICAL STYLE RULES — follow every one precisely:
 Output: Return ONLY valid JSON. No markdown fences, no code blocks, no explanation text."""
 
 US_USER_PROMPT = """\
-Write a travel blog post about: {prompt_topic}
-
-Today is {month_name} {year}.
+Write a travel blog post about the topic brief at the end of this message.
 
 Write exactly 4 sections. Each section has 3-5 SHORT paragraphs (2-4 sentences each).
 Every destination or route you mention must include a specific price in USD, the airline, and the US departure airport.
@@ -1333,167 +1375,522 @@ round-trip, and March temperatures are in the low 80s. My friend booked last Feb
 under $850 total including a decent Airbnb."
 
 Return ONLY this JSON (no markdown, no code fences, nothing else before or after):
-{{
+{
   "title": "SEO title with specific route or price angle, max 70 chars",
   "subtitle": "one punchy line with a specific claim or price, max 90 chars",
   "airport_names": "which US airports this post covers, concise",
   "meta": "SEO meta description 145-160 chars — mention specific destinations and USD price ranges",
   "sections": [
-    {{"heading": "section heading", "body": "short punchy paragraphs as a single HTML string, separated with <br><br>"}},
-    {{"heading": "section heading", "body": "..."}},
-    {{"heading": "section heading", "body": "..."}},
-    {{"heading": "section heading", "body": "..."}}
+    {"heading": "section heading", "body": "short punchy paragraphs as a single HTML string, separated with <br><br>"},
+    {"heading": "section heading", "body": "..."},
+    {"heading": "section heading", "body": "..."},
+    {"heading": "section heading", "body": "..."}
   ],
-  "cta_airport": "{cta_airport}"
-}}
+  "cta_airport": "the CTA airport code given in the brief"
+}"""
+
+# Per-topic brief (both markets), sent after the cached prompt
+TOPIC_PROMPT = """\
+Topic brief: {prompt_topic}
 
-Topic brief: {prompt_topic}"""
+Today is {month_name} {year}. CTA airport code: {cta_airport}"""
 
 
 # ── Helpers ──────────────────────────────────────────────────────────────────
 
+# Post metadata, loaded from BLOG_DIR once per run and kept current by _save_post,
+# so picking topics and building related links doesn't re-read every post.
+POST_INDEX_TTL = 300           # seconds before a long-lived process re-scans BLOG_DIR
+_TOPIC_MONTHS  = {t['slug']: t.get('best_months') for t in TOPIC_PIPELINE}
+_index_lock    = threading.Lock()
+_post_index    = None          # {slug: {slug, title, market, months, published_at, mtime}}
+_post_index_at = 0.0
+
+
+def _post_meta(slug: str, post: dict, mtime: float) -> dict:
+    return {
+        "slug":         slug,
+        "title":        post.get('title', slug),
+        "market":       post.get('market', 'uk'),
+        "months":       _TOPIC_MONTHS.get(slug),
+        "published_at": post.get('published_at', ''),
+        "mtime":        mtime,
+    }
+
+
+def post_index(refresh: bool = False) -> dict:
+    """
+    {slug: metadata} for every JSON post in BLOG_DIR, scanned at most once per
+    POST_INDEX_TTL. Returns a copy taken under _index_lock, so callers can
+    iterate it while bulk workers add posts through _index_post.
+    """
+    global _post_index, _post_index_at
+    with _index_lock:
+        if refresh or _post_index is None or time.time() - _post_index_at > POST_INDEX_TTL:
+            index = {}
+            if os.path.isdir(BLOG_DIR):
+                for entry in os.scandir(BLOG_DIR):
+                    if not entry.name.endswith('.json') or entry.name.startswith('.'):
+                        continue
+                    slug = entry.name[:-5]
+                    try:
+                        with open(entry.path, encoding='utf-8') as f:
+                            post = json.load(f)
+                    except Exception:
+                        post = {}
+                    index[slug] = _post_meta(slug, post, entry.stat().st_mtime)
+            _post_index, _post_index_at = index, time.time()
+        return dict(_post_index)
+
+
+def _index_post(post: dict, mtime: float):
+    with _index_lock:
+        if _post_index is not None:
+            _post_index[post['slug']] = _post_meta(post['slug'], post, mtime)
+
+
 def _published_slugs() -> dict:
     """Return {slug: mtime_seconds} for every JSON post in BLOG_DIR."""
-    result = {}
-    if not os.path.isdir(BLOG_DIR):
-        return result
-    for fn in os.listdir(BLOG_DIR):
-        if fn.endswith('.json') and not fn.startswith('.'):
-            slug = fn[:-5]
-            result[slug] = os.path.getmtime(os.path.join(BLOG_DIR, fn))
-    return result
-
-
-def _seasonal_match(months, current_month: int) -> bool:
-    """True if current_month is within 2 months of any month in the list."""
+    return {slug: meta['mtime'] for slug, meta in post_index().items()}
+
+
+# ── Topic scheduling ─────────────────────────────────────────────────────────
+# Relevance of each topic in each calendar month, computed once at import:
+# 1.0 in a best month, tapering to 0.3 two months away (the old ±2 window),
+# 0 out of season. Evergreen topics sit just below every in-season topic.
+EVERGREEN_RELEVANCE = 0.25
+_SEASON_WEIGHTS     = {0: 1.0, 1: 0.6, 2: 0.3}
+PLAN_WEEKS          = 13       # one quarter
+
+
+def _relevance(months, month: int) -> float:
     if not months:
-        return False
-    return any(min((current_month - m) % 12, (m - current_month) % 12) <= 2 for m in months)
+        return EVERGREEN_RELEVANCE
+    distance = min(min((month - m) % 12, (m - month) % 12) for m in months)
+    return _SEASON_WEIGHTS.get(distance, 0.0)
 
 
-def pick_next_topic(force: bool = False, specific_slug: str = None) -> dict | None:
+SEASON_CALENDAR = {
+    month: {t['slug']: _relevance(t.get('best_months'), month) for t in TOPIC_PIPELINE}
+    for month in range(1, 13)
+}
+
+
+def _topic_score(slug: str, month: int, age_days, force: bool = False):
     """
-    Return the next topic to generate.
-
-    Priority:
-    1. Unpublished topic whose best_months matches current month (±2 months)
-    2. Unpublished evergreen topic
-    3. Oldest stale seasonal topic (age ≥ STALE_DAYS)
-    4. Oldest stale topic overall
-    Returns None if everything is fresh.
+    Priority of a topic this month: unpublished (3+) beats stale (1-2.2), and
+    within each, seasonal relevance decides, with older stale posts nudged up.
+    Fresh posts score None (not due) unless force is set.
     """
-    published = _published_slugs()
-    now_month = datetime.now().month
-    now_ts    = time.time()
+    relevance = SEASON_CALENDAR[month][slug]
+    if age_days is None:
+        return 3.0 + relevance
+    if age_days >= STALE_DAYS:
+        return 1.0 + relevance + 0.2 * min(age_days / STALE_DAYS - 1, 1.0)
+    return relevance if force else None
+
+
+def _ranked(now: datetime, published: dict, force: bool = False) -> list:
+    """[(score, topic)] for every due topic at `now`, best first; ties keep pipeline order."""
+    ts = now.timestamp()
+    scored = []
+    for pos, topic in enumerate(TOPIC_PIPELINE):
+        slug = topic['slug']
+        age = (ts - published[slug]) / 86400 if slug in published else None
+        score = _topic_score(slug, now.month, age, force)
+        if score is not None:
+            scored.append((-score, pos, topic))
+    scored.sort(key=lambda x: x[:2])
+    return [(-neg, topic) for neg, _, topic in scored]
+
+
+def rank_topics(force: bool = False, now: datetime = None) -> list:
+    """Due topics, best first (all topics with force)."""
+    return [t for _, t in _ranked(now or datetime.now(), _published_slugs(), force)]
+
+
+def plan_schedule(start: datetime = None, weeks: int = PLAN_WEEKS, per_week: int = 1,
+                  budget: int = None) -> list:
+    """
+    Plan generation week by week from `start`: each week takes its per_week
+    best-ranked topics, counting earlier picks as published on their week,
+    until `budget` posts are planned. Returns [(date, score, topic)].
+    """
+    start = start or datetime.now()
+    published = dict(_published_slugs())
+    plan = []
+    for week in range(weeks):
+        when = start + timedelta(weeks=week)
+        for score, topic in _ranked(when, published)[:per_week]:
+            if budget is not None and len(plan) >= budget:
+                return plan
+            plan.append((when, score, topic))
+            published[topic['slug']] = when.timestamp()
+    return plan
+
 
+def pick_next_topic(force: bool = False, specific_slug: str = None) -> dict | None:
+    """
+    Return the next topic to generate: the best-scored due topic this month
+    (see _topic_score). Unpublished topics come before stale ones (age ≥
+    STALE_DAYS); in-season topics before evergreen, evergreen before
+    out-of-season. Returns None if everything is fresh.
+    """
     if specific_slug:
         for t in TOPIC_PIPELINE:
             if t['slug'] == specific_slug:
                 return t
         return None
 
-    unpub_seasonal, unpub_evergreen = [], []
-    stale_seasonal, stale_any       = [], []
-
-    for topic in TOPIC_PIPELINE:
-        slug    = topic['slug']
-        months  = topic.get('best_months')
-        is_seas = _seasonal_match(months, now_month)
-
-        if slug not in published:
-            (unpub_seasonal if is_seas else unpub_evergreen).append(topic)
-        elif not force:
-            age = (now_ts - published[slug]) / 86400
-            if age >= STALE_DAYS:
-                (stale_seasonal if is_seas else stale_any).append((age, topic))
-
-    if force:
-        # Regenerate the next seasonally-relevant or first-in-list
-        for topic in TOPIC_PIPELINE:
-            if _seasonal_match(topic.get('best_months'), now_month):
-                return topic
-        return TOPIC_PIPELINE[0]
-
-    for bucket in (unpub_seasonal, unpub_evergreen):
-        if bucket:
-            return bucket[0]
-    for stale in (stale_seasonal, stale_any):
-        if stale:
-            return max(stale, key=lambda x: x[0])[1]
-    return None
-
+    ranked = rank_topics(force=force)
+    return ranked[0] if ranked else None
 
-def _build_related(exclude_slug: str) -> list:
-    """Return up to 3 [slug, title] pairs for the related posts section."""
-    published = _published_slugs()
-    related = []
 
-    # From already-generated disk posts
-    for fn in sorted(os.listdir(BLOG_DIR)):
-        if not fn.endswith('.json') or fn.startswith('.'):
-            continue
-        slug = fn[:-5]
-        if slug == exclude_slug:
-            continue
-        try:
-            with open(os.path.join(BLOG_DIR, fn), encoding='utf-8') as f:
-                d = json.load(f)
-            related.append([slug, d.get('title', slug)])
-        except Exception:
-            pass
-        if len(related) >= 3:
-            return related
+def _months_overlap(a, b) -> bool:
+    """True if any month in a is within a month of any month in b."""
+    if not a or not b:
+        return False
+    return any(min((x - y) % 12, (y - x) % 12) <= 1 for x in a for y in b)
 
-    # Fill remainder from static hardcoded posts
-    for slug, title in STATIC_POSTS:
-        if slug == exclude_slug or any(r[0] == slug for r in related):
-            continue
-        related.append([slug, title])
-        if len(related) >= 3:
-            break
 
-    return related
+def _build_related(exclude_slug: str, market: str = 'uk', months=None) -> list:
+    """
+    Return up to 3 [slug, title] pairs for the related posts section: same
+    market first, then overlapping season, then newest. Static posts in
+    app.py (UK, evergreen) fill in behind generated ones.
+    """
+    candidates = [m for m in post_index().values() if m['slug'] != exclude_slug]
+    generated = {m['slug'] for m in candidates}
+    candidates += [
+        {"slug": slug, "title": title, "market": 'uk', "months": None, "published_at": ''}
+        for slug, title in STATIC_POSTS
+        if slug != exclude_slug and slug not in generated
+    ]
+    candidates.sort(key=lambda m: (m['market'] == market, _months_overlap(m['months'], months),
+                                   m['published_at']), reverse=True)
+    return [[m['slug'], m['title']] for m in candidates[:3]]
 
 
 # ── Core generator ───────────────────────────────────────────────────────────
 
-def generate_post(topic: dict, dry_run: bool = False) -> dict | None:
-    """
-    Call the Claude API and save the blog post JSON to BLOG_DIR.
-    Returns the post dict, or None on failure.
-    """
+# Shared across worker threads: a rate limit seen by one worker pauses them all
+_backoff_lock  = threading.Lock()
+_backoff_until = 0.0
+
+
+def _make_client():
+    """Anthropic client, or None (with a warning) when no API key is configured."""
     api_key = os.environ.get('ANTHROPIC_API_KEY')
     if not api_key:
         print("[blog_generator] ANTHROPIC_API_KEY not set — skipping generation.", file=sys.stderr)
         return None
+    # Retries are handled in _create_message so concurrent workers back off together
+    return anthropic.Anthropic(api_key=api_key, max_retries=0)
 
-    client = anthropic.Anthropic(api_key=api_key)
 
+def _build_request(topic: dict) -> dict:
+    """Keyword arguments for messages.create for this topic."""
     is_us = topic.get('market', 'uk') == 'us'
     sys_prompt  = US_SYSTEM_PROMPT if is_us else SYSTEM_PROMPT
     user_prompt = US_USER_PROMPT   if is_us else USER_PROMPT
 
-    prompt = user_prompt.format(
+    brief = TOPIC_PROMPT.format(
         prompt_topic=topic['prompt_topic'],
         month_name=datetime.now().strftime('%B'),
         year=datetime.now().year,
         cta_airport=topic['cta_airport'],
     )
+    # Persona + instructions/schema form an identical prefix for every post in a
+    # market; one breakpoint at its end caches all of it once it clears
+    # CACHE_MIN_TOKENS (it currently doesn't; see the note above USER_PROMPT).
+    return {
+        "model":      MODEL,
+        "max_tokens": MAX_TOKENS,
+        "system":     [{"type": "text", "text": sys_prompt}],
+        "messages":   [{"role": "user", "content": [
+            {"type": "text", "text": user_prompt, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": brief},
+        ]}],
+    }
+
+
+def cache_check(client=None) -> bool:
+    """
+    Count each market's cacheable prefix with messages.count_tokens, then send
+    the same prefix twice (max_tokens=1) and print the cache write and read.
+    True if every prefix clears CACHE_MIN_TOKENS and the second call read it.
+    """
+    client = client or _make_client()
+    if client is None:
+        return False
+    ok = True
+    for market in ('uk', 'us'):
+        topic = next(t for t in TOPIC_PIPELINE if t.get('market', 'uk') == market)
+        request = _build_request(topic)
+        prefix = {**request, "messages": [{"role": "user", "content": request["messages"][0]["content"][:1]}]}
+        prefix.pop("max_tokens")
+        tokens = client.messages.count_tokens(**prefix).input_tokens
+        verdict = "" if tokens >= CACHE_MIN_TOKENS else " — BELOW the minimum, so it is not cached"
+        print(f"[blog_generator] {market}: cacheable prefix is {tokens} tokens "
+              f"(minimum {CACHE_MIN_TOKENS}){verdict}")
+        ok &= tokens >= CACHE_MIN_TOKENS
+        for call in ('first', 'second'):
+            usage = _create_message(client, {**request, "max_tokens": 1}).usage
+            print(f"[blog_generator] {market} {call} call: "
+                  f"cache_write={usage.cache_creation_input_tokens or 0} "
+                  f"cache_read={usage.cache_read_input_tokens or 0}")
+        ok &= (usage.cache_read_input_tokens or 0) > 0
+    return ok
+
+
+_usage_lock   = threading.Lock()
+_usage_totals = {'input': 0, 'output': 0, 'cache_write': 0, 'cache_read': 0}
+
+
+def _report_usage(slug: str, usage) -> None:
+    """Print one post's token usage (including prompt-cache reads/writes) and add it to the totals."""
+    if usage is None:
+        return
+    counts = {
+        'input':       getattr(usage, 'input_tokens', 0) or 0,
+        'output':      getattr(usage, 'output_tokens', 0) or 0,
+        'cache_write': getattr(usage, 'cache_creation_input_tokens', 0) or 0,
+        'cache_read':  getattr(usage, 'cache_read_input_tokens', 0) or 0,
+    }
+    with _usage_lock:
+        for k, v in counts.items():
+            _usage_totals[k] += v
+    print(f"[blog_generator] Tokens for {slug}: {_format_usage(counts)}")
+
+
+def _format_usage(counts: dict) -> str:
+    return (f"in={counts['input']} out={counts['output']} "
+            f"cache_write={counts['cache_write']} cache_read={counts['cache_read']}")
+
+
+def _usage_since(start: dict) -> dict:
+    with _usage_lock:
+        return {k: _usage_totals[k] - start[k] for k in _usage_totals}
 
-    print(f"[blog_generator] Generating: {topic['slug']} (market={topic.get('market', 'uk')}) …")
 
+def _retry_delay(exc: Exception, attempt: int) -> float | None:
+    """Seconds to wait before retrying after exc, or None if it isn't retryable."""
+    status = getattr(exc, 'status_code', None)
+    if status not in RETRY_STATUS and not isinstance(exc, anthropic.APIConnectionError):
+        return None
+    response = getattr(exc, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
     try:
-        msg = client.messages.create(
-            model="claude-sonnet-4-6",
-            max_tokens=4000,
-            system=sys_prompt,
-            messages=[{"role": "user", "content": prompt}],
-        )
-    except Exception as exc:
-        print(f"[blog_generator] API error: {exc}", file=sys.stderr)
+        return min(BACKOFF_MAX, float(retry_after))
+    except (TypeError, ValueError):
+        return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+
+
+def _with_backoff(call, *args, **kwargs):
+    """call(*args, **kwargs) with shared exponential backoff on rate limits and overloads."""
+    global _backoff_until
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        pause = _backoff_until - time.time()
+        if pause > 0:
+            time.sleep(pause)
+        try:
+            return call(*args, **kwargs)
+        except Exception as exc:
+            delay = _retry_delay(exc, attempt)
+            if delay is None or attempt == MAX_ATTEMPTS:
+                raise
+            with _backoff_lock:
+                _backoff_until = max(_backoff_until, time.time() + delay)
+            print(f"[blog_generator] {type(exc).__name__} (attempt {attempt}/{MAX_ATTEMPTS}) "
+                  f"— backing off {delay:.1f}s", file=sys.stderr)
+
+
+def _create_message(client, request: dict):
+    return _with_backoff(client.messages.create, **request)
+
+
+class _StreamAbort(Exception):
+    """A streamed response that can no longer become a valid post."""
+    def __init__(self, reason: str, usage=None):
+        super().__init__(reason)
+        self.usage = usage
+
+
+class _JsonStreamCheck:
+    """
+    Structural check over a streamed JSON reply. feed() raises _StreamAbort as
+    soon as the text can't become a single JSON object (chatter before it,
+    mismatched brackets, text after it, or an empty sections array); `done`
+    turns true when the top-level object closes.
+    """
+    _LEAD = re.compile(r'\s*(?:`{1,3}(?:j|js|jso|json)?\s*)?')
+    _PAIRS = {'}': '{', ']': '['}
+
+    def __init__(self):
+        self.lead = ''
+        self.stack = []
+        self.in_str = self.escaped = False
+        self.started = self.done = False
+        self.sections = 0
+
+    def feed(self, chunk: str):
+        for ch in chunk:
+            if self.done:
+                if not (ch.isspace() or ch == '`'):
+                    raise _StreamAbort('text after the JSON object')
+            elif not self.started:
+                if ch == '{':
+                    self.started = True
+                    self.stack.append(ch)
+                    continue
+                self.lead += ch
+                if not self._LEAD.fullmatch(self.lead):
+                    raise _StreamAbort(f"reply doesn't start with a JSON object: {self.lead[:40]!r}")
+            elif self.in_str:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_str = False
+            elif ch == '"':
+                self.in_str = True
+            elif ch in '{[':
+                self.stack.append(ch)
+            elif ch in '}]':
+                if not self.stack or self.stack[-1] != self._PAIRS[ch]:
+                    raise _StreamAbort(f"mismatched '{ch}'")
+                self.stack.pop()
+                # The only top-level array in the schema is "sections"
+                if ch == '}' and self.stack == ['{', '[']:
+                    self.sections += 1
+                elif ch == ']' and self.stack == ['{'] and not self.sections:
+                    raise _StreamAbort('empty sections array')
+                if not self.stack:
+                    self.done = True
+
+
+# ── Progress (read by --list and the admin status endpoint) ─────────────────
+
+_progress_lock    = threading.Lock()
+_progress         = {}
+_progress_written = 0.0
+
+
+def _set_progress(slug: str, force_write: bool = False, **fields):
+    global _progress_written
+    with _progress_lock:
+        if fields:
+            _progress[slug] = {**_progress.get(slug, {}), **fields, 'updated_at': time.time()}
+        else:
+            _progress.pop(slug, None)
+        if not force_write and time.time() - _progress_written < PROGRESS_INTERVAL:
+            return
+        _progress_written = time.time()
+        try:
+            _write_json_atomic(PROGRESS_FILE, _progress)
+        except OSError:
+            pass
+
+
+def generation_progress() -> dict:
+    """{slug: {state, attempt, chars, sections, updated_at}} for generations in flight (any process)."""
+    try:
+        with open(PROGRESS_FILE, encoding='utf-8') as f:
+            progress = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    cutoff = time.time() - PROGRESS_MAX_AGE
+    return {slug: p for slug, p in progress.items() if p.get('updated_at', 0) >= cutoff}
+
+
+def _stream_once(client, request: dict, slug: str, attempt: int) -> tuple:
+    """Stream one reply, checking it as it arrives. Returns (text, usage)."""
+    check, parts, chars = _JsonStreamCheck(), [], 0
+    with client.messages.stream(**request) as stream:
+        try:
+            for text in stream.text_stream:
+                parts.append(text)
+                chars += len(text)
+                check.feed(text)
+                _set_progress(slug, state='streaming', attempt=attempt, chars=chars, sections=check.sections)
+                if check.done:
+                    break   # anything after the object is waste; stop generating
+        except _StreamAbort as exc:
+            exc.usage = _stream_usage(stream)
+            raise
+        usage = _stream_usage(stream)
+    if not check.done:
+        raise _StreamAbort('reply ended before the JSON object closed', usage)
+    return ''.join(parts), usage
+
+
+def _stream_usage(stream):
+    snapshot = getattr(stream, 'current_message_snapshot', None)
+    return getattr(snapshot, 'usage', None)
+
+
+def _cache_key(request: dict) -> str:
+    """Hash of everything that determines the model output: model, persona, schema, brief."""
+    blob = json.dumps(request, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(blob).hexdigest()
+
+
+def _cache_get(key: str) -> str | None:
+    path = os.path.join(GEN_CACHE_DIR, f"{key}.json")
+    try:
+        with open(path, encoding='utf-8') as f:
+            raw = json.load(f)['raw']
+        os.utime(path)   # eviction is least-recently-used by mtime
+        return raw
+    except (OSError, ValueError, KeyError):
         return None
 
-    raw = msg.content[0].text.strip()
+
+def _cache_put(key: str, slug: str, raw: str):
+    try:
+        os.makedirs(GEN_CACHE_DIR, exist_ok=True)
+        _write_json_atomic(os.path.join(GEN_CACHE_DIR, f"{key}.json"), {
+            "slug":       slug,
+            "model":      MODEL,
+            "created_at": datetime.now().isoformat(),
+            "raw":        raw,
+        })
+        _evict_cache()
+    except OSError as exc:
+        print(f"[blog_generator] Generation cache write failed: {exc}", file=sys.stderr)
+
+
+def _evict_cache(max_bytes: int = None):
+    """Delete least-recently-used entries until the cache fits in max_bytes."""
+    max_bytes = GEN_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    with os.scandir(GEN_CACHE_DIR) as it:
+        for e in it:
+            if e.name.endswith('.json'):
+                st = e.stat()
+                entries.append((st.st_mtime, st.st_size, e.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass   # another worker evicted it first
+        total -= size
+
+
+def _clean(text: str) -> str:
+    """Remove AI-tell punctuation patterns."""
+    text = re.sub(r'\s*—\s*', ', ', text)   # em dash → comma
+    text = re.sub(r'--+', ',', text)          # double hyphen → comma
+    return text
+
+
+def _parse_post(raw: str, topic: dict) -> dict | None:
+    """Turn the model's raw text into a post dict, or None if it isn't usable."""
+    raw = raw.strip()
 
     # Strip accidental markdown code fences
     if raw.startswith('```'):
@@ -1509,13 +1906,6 @@ def generate_post(topic: dict, dry_run: bool = False) -> dict | None:
         print(f"[blog_generator] JSON parse error: {exc}\nRaw: {raw[:300]}", file=sys.stderr)
         return None
 
-    def _clean(text: str) -> str:
-        """Remove AI-tell punctuation patterns."""
-        import re
-        text = re.sub(r'\s*—\s*', ', ', text)   # em dash → comma
-        text = re.sub(r'--+', ',', text)          # double hyphen → comma
-        return text
-
     for section in data.get('sections', []):
         if 'body' in section:
             section['body'] = _clean(section['body'])
@@ -1535,7 +1925,7 @@ def generate_post(topic: dict, dry_run: bool = False) -> dict | None:
         "sections":      data.get('sections', []),
         "cta_airport":   data.get('cta_airport',   topic['cta_airport']),
         "market":        topic.get('market', 'uk'),
-        "related":       _build_related(topic['slug']),
+        "related":       _build_related(topic['slug'], topic.get('market', 'uk'), topic.get('best_months')),
         "published_at":  datetime.now().isoformat(),
         "updated_at":    datetime.now().isoformat(),
     }
@@ -1543,15 +1933,98 @@ def generate_post(topic: dict, dry_run: bool = False) -> dict | None:
     if not post['sections']:
         print("[blog_generator] No sections in response — aborting save.", file=sys.stderr)
         return None
+    return post
+
+
+def _write_json_atomic(path: str, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _save_post(post: dict) -> str:
+    """Write the post atomically so the app never reads a half-written file."""
+    path = os.path.join(BLOG_DIR, f"{post['slug']}.json")
+    _write_json_atomic(path, post)
+    _index_post(post, os.path.getmtime(path))
+    return path
+
+
+def _touch_lock():
+    with open(LOCK_FILE, 'w') as f:
+        f.write(datetime.now().isoformat())
+
+
+def generate_post(topic: dict, dry_run: bool = False, client=None) -> dict | None:
+    """
+    Call the Claude API and save the blog post JSON to BLOG_DIR.
+    `client` is anything with messages.create (a stub works for local runs);
+    replies are streamed when STREAM_GENERATION is on and it has messages.stream.
+    Output cached for an identical request is replayed instead (see USE_GEN_CACHE).
+    Returns the post dict, or None on failure. API errors that no retry or
+    other topic would get past (bad key, bad request; see FATAL_STATUS) are
+    raised instead.
+    """
+    slug = topic['slug']
+    request = _build_request(topic)
+    key = _cache_key(request)
+    cached = _cache_get(key) if USE_GEN_CACHE else None
+    post = _parse_post(cached, topic) if cached is not None else None
+    if post is not None:
+        print(f"[blog_generator] Replaying cached output for {slug} ({key[:12]})")
+        return _finish_post(post, dry_run)
+
+    client = client or _make_client()
+    if client is None:
+        return None
+
+    print(f"[blog_generator] Generating: {slug} (market={topic.get('market', 'uk')}) …")
+    stream = STREAM_GENERATION and hasattr(client.messages, 'stream')
+    try:
+        for attempt in range(1, GENERATION_ATTEMPTS + 1):
+            _set_progress(slug, force_write=True, state='requesting', attempt=attempt, chars=0, sections=0)
+            try:
+                if stream:
+                    raw, usage = _with_backoff(_stream_once, client, request, slug, attempt)
+                else:
+                    msg = _create_message(client, request)
+                    raw, usage = msg.content[0].text, getattr(msg, 'usage', None)
+            except _StreamAbort as exc:
+                _report_usage(slug, exc.usage)
+                print(f"[blog_generator] {slug}: aborted attempt {attempt}/{GENERATION_ATTEMPTS}: {exc}",
+                      file=sys.stderr)
+                continue
+            except Exception as exc:
+                print(f"[blog_generator] API error: {exc}", file=sys.stderr)
+                if getattr(exc, 'status_code', None) in FATAL_STATUS:
+                    raise
+                return None
+
+            _report_usage(slug, usage)
+            post = _parse_post(raw, topic)
+            if post is not None:
+                _cache_put(key, slug, raw)
+                break
+    finally:
+        _set_progress(slug, force_write=True)
+    if post is None:
+        return None
+    return _finish_post(post, dry_run)
 
+
+def _finish_post(post: dict, dry_run: bool) -> dict:
     if dry_run:
         print(json.dumps(post, indent=2, ensure_ascii=False))
         return post
 
-    path = os.path.join(BLOG_DIR, f"{topic['slug']}.json")
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(post, f, ensure_ascii=False, indent=2)
-
+    path = _save_post(post)
     print(f"[blog_generator] Saved → {path}")
     return post
 
@@ -1570,6 +2043,7 @@ def run_next(force: bool = False) -> bool:
         if age_hours < 23:
             return False
 
+    post_index(refresh=True)
     topic = pick_next_topic(force=force)
     if topic is None:
         print("[blog_generator] No topics due — all posts are fresh.")
@@ -1578,30 +2052,239 @@ def run_next(force: bool = False) -> bool:
     post = generate_post(topic)
     if post:
         # Update lock file timestamp
-        with open(LOCK_FILE, 'w') as f:
-            f.write(datetime.now().isoformat())
+        _touch_lock()
         return True
     return False
 
 
 # ── CLI ───────────────────────────────────────────────────────────────────────
 
-def run_bulk(n: int = 5, force: bool = False) -> int:
-    """Generate up to n blog posts in one go. Returns count generated."""
-    generated = 0
+def run_bulk(n: int = 5, force: bool = False, workers: int = BULK_WORKERS, client=None) -> int:
+    """
+    Generate up to n blog posts, `workers` at a time. A failed topic frees its
+    slot for the next one in the pipeline, but at most n topics may fail
+    before refilling stops, and a FATAL_STATUS error stops the run. Prints a
+    per-topic report and returns the count generated.
+    """
+    post_index(refresh=True)
     published = _published_slugs()
-    for topic in TOPIC_PIPELINE:
-        if generated >= n:
-            break
-        if topic['slug'] in published and not force:
+    candidates = iter([t for t in rank_topics(force=force) if force or t['slug'] not in published])
+    client = client or _make_client()
+    if client is None or n <= 0:
+        return 0
+
+    generated, failures, report, in_flight = 0, 0, [], {}
+    halted = None
+    started, usage_start = time.time(), dict(_usage_totals)
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='blog-gen') as pool:
+        def submit_next():
+            topic = next(candidates, None)
+            if topic is not None:
+                future = pool.submit(generate_post, topic, client=client)
+                in_flight[future] = (topic['slug'], time.time())
+
+        for _ in range(min(n, max(1, workers))):
+            submit_next()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                slug, t0 = in_flight.pop(future)
+                try:
+                    ok = future.result() is not None
+                except Exception as exc:
+                    if getattr(exc, 'status_code', None) in FATAL_STATUS:
+                        halted = halted or exc
+                    else:
+                        print(f"[blog_generator] {slug}: unexpected error: {exc}", file=sys.stderr)
+                    ok = False
+                report.append((slug, ok, time.time() - t0))
+                generated += ok
+                failures += not ok
+                print(f"[blog_generator] {'ok    ' if ok else 'FAILED'} {slug} ({time.time() - t0:.1f}s)")
+                # Counting in-flight topics as possible failures caps the run at n failed topics
+                if halted is None and generated + len(in_flight) < n and failures + len(in_flight) < n:
+                    submit_next()
+
+    if generated:
+        _touch_lock()
+    failed = [slug for slug, ok, _ in report if not ok]
+    print(f"[blog_generator] Bulk run complete: {generated} post(s) generated, "
+          f"{len(failed)} failed, {time.time() - started:.1f}s with {workers} worker(s).")
+    print(f"[blog_generator] Tokens: {_format_usage(_usage_since(usage_start))}")
+    if failed:
+        print(f"[blog_generator] Failed: {', '.join(failed)}")
+    if halted is not None:
+        print(f"[blog_generator] Stopped early: {halted}", file=sys.stderr)
+    elif failures >= n and generated < n:
+        print(f"[blog_generator] Stopped early after {failures} failure(s).", file=sys.stderr)
+    return generated
+
+
+def due_topics(force: bool = False) -> list:
+    """Every topic that is unpublished or older than STALE_DAYS (all topics with force), best first."""
+    return rank_topics(force=force)
+
+
+def _load_batch_state() -> dict | None:
+    try:
+        with open(BATCH_STATE_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _abandon_batch(state: dict, reason: str):
+    """Forget a batch that can't be finished, so the next --batch run starts fresh."""
+    try:
+        os.remove(BATCH_STATE_FILE)
+    except OSError:
+        pass
+    raise RuntimeError(f"batch {state.get('batch_id')} abandoned: {reason}")
+
+
+def _recover_submission(client, state: dict) -> dict | None:
+    """
+    State saved before batches.create with no batch id: the run died while
+    submitting. Adopt a batch created since then with the same request count,
+    or drop the state so the topics are submitted again.
+    """
+    since = datetime.fromisoformat(state['submitted_at']).astimezone().timestamp() - 60
+    for batch in itertools.islice(client.messages.batches.list(limit=20), 20):
+        counts = batch.request_counts
+        total = counts.processing + counts.succeeded + counts.errored + counts.canceled + counts.expired
+        if batch.created_at.timestamp() >= since and total == len(state['slugs']):
+            state['batch_id'] = batch.id
+            _write_json_atomic(BATCH_STATE_FILE, state)
+            print(f"[blog_generator] Found batch {batch.id} from an interrupted submission.")
+            return state
+    print("[blog_generator] Interrupted submission never reached the API — submitting again.")
+    os.remove(BATCH_STATE_FILE)
+    return None
+
+
+def run_batch(n: int = 0, force: bool = False, client=None,
+              poll_seconds: float = BATCH_POLL_SECONDS) -> int:
+    """
+    Regenerate due topics through the Message Batches API: one batch job,
+    polled until it ends, then each result parsed and saved like a normal post.
+
+    Progress lives in BATCH_STATE_FILE, written before the batch is
+    submitted, so an interrupted run picks up the same batch (and skips posts
+    already saved) instead of submitting a new one. A batch that is gone,
+    can't be polled BATCH_POLL_ERRORS times in a row, or hasn't ended
+    BATCH_MAX_HOURS after submission is abandoned: the state is cleared and
+    RuntimeError raised. Returns the count generated.
+    """
+    client = client or _make_client()
+    if client is None:
+        return 0
+
+    state = _load_batch_state()
+    if state and not state.get('batch_id'):
+        state = _recover_submission(client, state)
+    if state:
+        print(f"[blog_generator] Resuming batch {state['batch_id']} "
+              f"({len(state['saved'])}/{len(state['slugs'])} saved).")
+    else:
+        post_index(refresh=True)
+        topics = due_topics(force)
+        topics = topics[:n] if n else topics
+        if USE_GEN_CACHE:
+            # Anything already generated for an identical request is replayed, not resubmitted
+            replayed = [t for t in topics if _cache_get(_cache_key(_build_request(t))) is not None]
+            replayed_count = sum(generate_post(t) is not None for t in replayed)
+            topics = [t for t in topics if t not in replayed]
+        else:
+            replayed_count = 0
+        if not topics:
+            print(f"[blog_generator] No topics left to submit ({replayed_count} replayed from cache).")
+            return replayed_count
+        state = {
+            "batch_id":     None,
+            "slugs":        [t['slug'] for t in topics],
+            "saved":        [],
+            "failed":       [],
+            "replayed":     replayed_count,
+            "submitted_at": datetime.now().isoformat(),
+        }
+        # Saved first, so a crash mid-submit can't orphan a paid batch (see _recover_submission)
+        _write_json_atomic(BATCH_STATE_FILE, state)
+        try:
+            batch = _with_backoff(client.messages.batches.create, requests=[
+                {"custom_id": t['slug'], "params": _build_request(t)} for t in topics
+            ])
+        except Exception as exc:
+            if getattr(exc, 'status_code', None) is not None:
+                os.remove(BATCH_STATE_FILE)   # rejected outright: nothing was created
+            raise
+        state['batch_id'] = batch.id
+        _write_json_atomic(BATCH_STATE_FILE, state)
+        print(f"[blog_generator] Submitted batch {batch.id} with {len(topics)} topic(s).")
+
+    deadline = datetime.fromisoformat(state['submitted_at']).astimezone().timestamp() + BATCH_MAX_HOURS * 3600
+    errors = 0
+    while True:
+        if time.time() >= deadline:
+            try:
+                client.messages.batches.cancel(state['batch_id'])
+            except Exception as exc:
+                print(f"[blog_generator] Couldn't cancel batch {state['batch_id']}: {exc}", file=sys.stderr)
+            _abandon_batch(state, f"not ended after {BATCH_MAX_HOURS}h")
+        try:
+            batch = _with_backoff(client.messages.batches.retrieve, state['batch_id'])
+        except Exception as exc:
+            errors += 1
+            if getattr(exc, 'status_code', None) in FATAL_STATUS:
+                _abandon_batch(state, str(exc))
+            if errors >= BATCH_POLL_ERRORS:
+                _abandon_batch(state, f"{errors} poll errors in a row, last: {exc}")
+            print(f"[blog_generator] Batch poll error ({errors}/{BATCH_POLL_ERRORS}): {exc}", file=sys.stderr)
+        else:
+            errors = 0
+            if batch.processing_status == 'ended':
+                break
+            counts = batch.request_counts
+            print(f"[blog_generator] Batch {state['batch_id']}: {batch.processing_status} "
+                  f"({counts.succeeded} ok, {counts.errored} errored, {counts.processing} processing)")
+        time.sleep(poll_seconds)
+
+    topics = {t['slug']: t for t in TOPIC_PIPELINE}
+    done = set(state['saved']) | set(state['failed'])
+    try:
+        results = _with_backoff(client.messages.batches.results, state['batch_id'])
+    except Exception as exc:
+        if getattr(exc, 'status_code', None) in FATAL_STATUS:
+            _abandon_batch(state, f"results unavailable: {exc}")
+        raise
+    # Expired and cancelled requests come back as non-succeeded results and count as failed
+    for entry in results:
+        slug = entry.custom_id
+        if slug in done or slug not in topics:
             continue
-        post = generate_post(topic)
+        post = None
+        if entry.result.type == 'succeeded':
+            raw = entry.result.message.content[0].text
+            _report_usage(slug, getattr(entry.result.message, 'usage', None))
+            post = _parse_post(raw, topics[slug])
+            if post:
+                _cache_put(_cache_key(_build_request(topics[slug])), slug, raw)
+        else:
+            print(f"[blog_generator] {slug}: batch result {entry.result.type}", file=sys.stderr)
         if post:
-            generated += 1
-            published[topic['slug']] = time.time()
-            with open(LOCK_FILE, 'w') as f:
-                f.write(datetime.now().isoformat())
-    print(f"[blog_generator] Bulk run complete: {generated} post(s) generated.")
+            print(f"[blog_generator] Saved → {_save_post(post)}")
+            state['saved'].append(slug)
+        else:
+            state['failed'].append(slug)
+        _write_json_atomic(BATCH_STATE_FILE, state)
+
+    generated = len(state['saved']) + state.get('replayed', 0)
+    if generated:
+        _touch_lock()
+    os.remove(BATCH_STATE_FILE)
+    print(f"[blog_generator] Batch run complete: {generated} post(s) generated, "
+          f"{len(state['failed'])} failed.")
+    if state['failed']:
+        print(f"[blog_generator] Failed: {', '.join(state['failed'])}")
     return generated
 
 
@@ -1613,27 +2296,77 @@ def _cli():
     parser.add_argument('--topic',   metavar='SLUG',      help='Generate a specific topic by slug')
     parser.add_argument('--bulk',    metavar='N', type=int, default=0,
                         help='Generate up to N unpublished posts in one run')
+    parser.add_argument('--workers', metavar='N', type=int, default=BULK_WORKERS,
+                        help=f'Concurrent API calls for --bulk (default {BULK_WORKERS})')
+    parser.add_argument('--batch',   action='store_true',
+                        help='Regenerate all due topics (or --bulk N of them) as one Message Batch')
+    parser.add_argument('--poll',    metavar='SECONDS', type=float, default=BATCH_POLL_SECONDS,
+                        help=f'Batch status poll interval (default {BATCH_POLL_SECONDS}s)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always call the API instead of replaying cached output (fresh output is still cached)')
+    parser.add_argument('--cache-check', action='store_true',
+                        help='Measure the cached prompt prefix and confirm a cache read (2 tiny calls per market)')
+    parser.add_argument('--plan',    action='store_true',
+                        help=f'Show the generation plan for the next quarter ({PLAN_WEEKS} weeks)')
+    parser.add_argument('--simulate', action='store_true',
+                        help='Show a simulated year (52 weeks) of weekly picks')
+    parser.add_argument('--start',   metavar='YYYY-MM-DD', help='First week for --plan/--simulate (default today)')
+    parser.add_argument('--per-week', metavar='N', type=int, default=1,
+                        help='Posts per week for --plan/--simulate (default 1)')
+    parser.add_argument('--budget',  metavar='N', type=int,
+                        help='Cap on total posts for --plan/--simulate')
     args = parser.parse_args()
 
+    global USE_GEN_CACHE
+    USE_GEN_CACHE = not args.no_cache
+
     if args.list:
         published = _published_slugs()
+        in_flight = generation_progress()
         now_month = datetime.now().month
         print(f"\n{'SLUG':<45} {'STATUS':<12} {'SEASONAL'}")
         print("-" * 75)
         for t in TOPIC_PIPELINE:
             slug = t['slug']
-            if slug in published:
+            if slug in in_flight:
+                p = in_flight[slug]
+                status = f"writing {p.get('sections', 0)}/4" if p.get('chars') else p.get('state', 'running')
+            elif slug in published:
                 age = (time.time() - published[slug]) / 86400
                 status = f"ok ({int(age)}d)" if age < STALE_DAYS else f"STALE ({int(age)}d)"
             else:
                 status = "unpublished"
-            seas = "✓" if _seasonal_match(t.get('best_months'), now_month) else ""
+            seas = "✓" if SEASON_CALENDAR[now_month][slug] >= _SEASON_WEIGHTS[2] else ""
             print(f"{slug:<45} {status:<12} {seas}")
         print()
         return
 
+    if args.cache_check:
+        sys.exit(0 if cache_check() else 1)
+
+    if args.plan or args.simulate:
+        start = datetime.strptime(args.start, '%Y-%m-%d') if args.start else datetime.now()
+        weeks = 52 if args.simulate else PLAN_WEEKS
+        plan = plan_schedule(start, weeks=weeks, per_week=args.per_week, budget=args.budget)
+        print(f"\n{'WEEK OF':<12} {'SCORE':>5}  {'SLUG':<45} {'WHY'}")
+        print("-" * 80)
+        for when, score, topic in plan:
+            why = "new" if score >= 3 else "refresh"
+            why += ", in season" if SEASON_CALENDAR[when.month][topic['slug']] >= _SEASON_WEIGHTS[2] else ""
+            print(f"{when:%Y-%m-%d}   {score:>5.2f}  {topic['slug']:<45} {why}")
+        print(f"\n{len(plan)} post(s) over {weeks} week(s).\n")
+        return
+
+    if args.batch:
+        try:
+            run_batch(n=args.bulk, force=args.force, poll_seconds=args.poll)
+        except RuntimeError as exc:
+            print(f"[blog_generator] {exc}", file=sys.stderr)
+            sys.exit(1)
+        return
+
     if args.bulk:
-        run_bulk(n=args.bulk, force=args.force)
+        run_bulk(n=args.bulk, force=args.force, workers=args.workers)
         return
 
     if args.topic:
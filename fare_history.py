@@ -0,0 +1,264 @@
+"""
+Fare history for getmeoutofhere.live
+
+Every Travelpayouts response we fetch is appended here as one observation
+per fare. The fields are origin, destination, depart_date, currency, price,
+changes and observed_at. Raw observations are kept for RAW_RETENTION_DAYS.
+After that, compact() rolls them up into one daily min/median row per route
+and currency, so the table grows with routes x days, not with traffic.
+
+Writes go through a background thread so request handlers never wait on disk.
+range_query() and typical_price() read the daily rollups and the recent raw
+rows together, through indexes keyed by route.
+"""
+
+import os
+import queue
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# ---- Paths / tuning ----
+_HERE              = os.path.dirname(os.path.abspath(__file__))
+FARE_HISTORY_DB    = os.path.join(_HERE, 'data', 'fare_history.db')
+RAW_RETENTION_DAYS = 14      # raw observations older than this are rolled up
+WRITE_BATCH        = 500     # observations per insert transaction
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    origin      TEXT    NOT NULL,
+    destination TEXT    NOT NULL,
+    currency    TEXT    NOT NULL,
+    depart_date TEXT    NOT NULL DEFAULT '',
+    price       REAL    NOT NULL,
+    changes     INTEGER NOT NULL DEFAULT 0,
+    observed_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_observations_route
+    ON observations (origin, destination, currency, observed_at);
+CREATE INDEX IF NOT EXISTS idx_observations_time
+    ON observations (observed_at);
+CREATE TABLE IF NOT EXISTS daily (
+    origin       TEXT    NOT NULL,
+    destination  TEXT    NOT NULL,
+    currency     TEXT    NOT NULL,
+    day          TEXT    NOT NULL,
+    min_price    REAL    NOT NULL,
+    median_price REAL    NOT NULL,
+    samples      INTEGER NOT NULL,
+    PRIMARY KEY (origin, destination, currency, day)
+) WITHOUT ROWID;
+"""
+
+
+def _log(msg: str):
+    print(f"[fare_history] {msg}", file=sys.stderr)
+
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(FARE_HISTORY_DB), exist_ok=True)
+    conn = sqlite3.connect(FARE_HISTORY_DB, timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _day(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%d')
+
+
+# ---- Writes ----
+_queue = queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+
+def _rows_from_fares(origin: str, currency: str, fares: list, observed_at: int) -> list:
+    rows = []
+    for f in fares or []:
+        dest = f.get('destination')
+        price = f.get('value')
+        if not dest or not isinstance(price, (int, float)) or price <= 0:
+            continue
+        rows.append((
+            origin.upper(), dest.upper(), currency.lower(),
+            (f.get('depart_date') or '')[:10], float(price),
+            int(f.get('number_of_changes') or 0), observed_at,
+        ))
+    return rows
+
+
+def write(rows: list):
+    """Insert observation tuples synchronously (used by the writer thread and imports)."""
+    conn = _connect()
+    try:
+        for i in range(0, len(rows), WRITE_BATCH):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    """
+                    INSERT INTO observations
+                        (origin, destination, currency, depart_date, price, changes, observed_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    rows[i:i + WRITE_BATCH],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    finally:
+        conn.close()
+
+
+def _writer_loop():
+    while True:
+        rows = _queue.get()
+        # Coalesce whatever else is already waiting into the same transaction
+        while len(rows) < WRITE_BATCH:
+            try:
+                rows.extend(_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            write(rows)
+        except Exception as exc:
+            _log(f"write error ({len(rows)} rows dropped): {exc}")
+
+
+def record(origin: str, currency: str, fares: list, observed_at: float = None):
+    """Queue a Travelpayouts response for storage. Never blocks on disk."""
+    global _writer
+    rows = _rows_from_fares(origin, currency, fares, int(observed_at or time.time()))
+    if not rows:
+        return
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_writer_loop, name='fare-history-writer', daemon=True)
+                _writer.start()
+    _queue.put(rows)
+
+
+# ---- Compaction ----
+
+def compact(raw_retention_days: int = RAW_RETENTION_DAYS) -> int:
+    """
+    Roll raw observations older than the retention window up into daily
+    min/median rows, then delete them. Returns the number of raw rows compacted.
+    """
+    cutoff_day = _day(time.time() - raw_retention_days * 86400)
+    cutoff = int(datetime.strptime(cutoff_day, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cur = conn.execute(
+                """
+                SELECT origin, destination, currency,
+                       strftime('%Y-%m-%d', observed_at, 'unixepoch') AS day, price
+                FROM observations
+                WHERE observed_at < ?
+                ORDER BY origin, destination, currency, day
+                """,
+                (cutoff,),
+            )
+            rollups, key, prices, compacted = [], None, [], 0
+            for r in cur:
+                k = (r['origin'], r['destination'], r['currency'], r['day'])
+                if k != key:
+                    if prices:
+                        rollups.append(_merge_daily(conn, key, prices))
+                    key, prices = k, []
+                prices.append(r['price'])
+                compacted += 1
+            if prices:
+                rollups.append(_merge_daily(conn, key, prices))
+
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO daily
+                    (origin, destination, currency, day, min_price, median_price, samples)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                rollups,
+            )
+            conn.execute("DELETE FROM observations WHERE observed_at < ?", (cutoff,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return compacted
+    finally:
+        conn.close()
+
+
+def _merge_daily(conn, key: tuple, prices: list) -> tuple:
+    """Daily rollup row for `key`, folding in any rollup already stored for that day."""
+    existing = conn.execute(
+        "SELECT min_price, median_price, samples FROM daily "
+        "WHERE origin = ? AND destination = ? AND currency = ? AND day = ?",
+        key,
+    ).fetchone()
+    if existing:
+        # The original samples are gone; weight the stored median by its sample count
+        prices = prices + [existing['median_price']] * existing['samples']
+        low = min(min(prices), existing['min_price'])
+    else:
+        low = min(prices)
+    return (*key, low, statistics.median(prices), len(prices))
+
+
+# ---- Reads ----
+
+def range_query(origin: str, destination: str, currency: str,
+                start: str = None, end: str = None) -> list:
+    """
+    Daily fare series for a route between start and end (YYYY-MM-DD, inclusive).
+    Returns [{day, min, median, samples}] oldest first, with recent days computed
+    from raw observations and older days from the rollups.
+    """
+    key = (origin.upper(), destination.upper(), currency.lower())
+    start = start or '0000-00-00'
+    end = end or '9999-99-99'
+    conn = _connect()
+    try:
+        series = {
+            r['day']: {'day': r['day'], 'min': r['min_price'],
+                       'median': r['median_price'], 'samples': r['samples']}
+            for r in conn.execute(
+                "SELECT day, min_price, median_price, samples FROM daily "
+                "WHERE origin = ? AND destination = ? AND currency = ? AND day BETWEEN ? AND ?",
+                (*key, start, end),
+            )
+        }
+        start_ts = 0 if start.startswith('0000') else int(
+            datetime.strptime(start, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+        raw = {}
+        for r in conn.execute(
+            "SELECT observed_at, price FROM observations "
+            "WHERE origin = ? AND destination = ? AND currency = ? AND observed_at >= ?",
+            (*key, start_ts),
+        ):
+            day = _day(r['observed_at'])
+            if day <= end:
+                raw.setdefault(day, []).append(r['price'])
+        for day, prices in raw.items():
+            series[day] = {'day': day, 'min': min(prices),
+                           'median': statistics.median(prices), 'samples': len(prices)}
+        return [series[d] for d in sorted(series)]
+    finally:
+        conn.close()
+
+
+def typical_price(origin: str, destination: str, currency: str, days: int = 90):
+    """Median of the daily medians over the last `days` days, or None without data."""
+    start = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
+    series = range_query(origin, destination, currency, start=start)
+    if not series:
+        return None
+    return statistics.median(p['median'] for p in series)
@@ -0,0 +1,21 @@
+"""
+Gunicorn settings for getmeoutofhere.live
+
+Gunicorn loads this file from the working directory automatically. Each
+worker starts the app's background work (scheduler, subscriber flusher, job
+consumer) once the app is loaded, and stops it on exit so its job-consumer
+lease passes to another worker straight away.
+"""
+
+import sys
+
+
+def post_worker_init(worker):
+    import app
+    app.start_background()
+
+
+def worker_exit(server, worker):
+    app = sys.modules.get('app')
+    if app is not None:
+        app.stop_background()
@@ -0,0 +1,308 @@
+"""
+Background job queue for getmeoutofhere.live
+
+Slow work such as blog generation is queued here rather than run on a loose
+thread inside whichever gunicorn worker took the request. Jobs are rows in
+data/jobs.db, so they survive worker restarts. enqueue() returns a job id
+that /admin/jobs/<id> can poll. A job identical to one already pending or
+running is not queued twice. A job queued with once=True (such as a dated
+key like blog-weekly for one day) is not queued again after it has finished.
+
+Each host has one consumer. Every worker calls start_consumer(), but only
+the worker holding the host's lease (see leases.py) claims and runs jobs,
+at most JOB_CONCURRENCY at a time. A running job's claim is refreshed while
+it works. If the worker dies, the claim expires and the job goes back to
+pending, up to MAX_ATTEMPTS times.
+
+CLI usage:
+    python jobs.py --list        # most recent jobs
+    python jobs.py --show 42     # one job, with its result or error
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import leases
+
+# ---- Paths / tuning ----
+_HERE           = os.path.dirname(os.path.abspath(__file__))
+JOBS_DB         = os.path.join(_HERE, 'data', 'jobs.db')
+JOB_CONCURRENCY = int(os.environ.get('JOB_CONCURRENCY', '1'))
+JOB_POLL        = 5       # seconds between queue checks when idle
+JOB_CLAIM_TTL   = 300     # seconds a running job stays claimed without a refresh
+MAX_ATTEMPTS    = 3       # claims before a job that keeps dying is marked failed
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind        TEXT NOT NULL,
+    params      TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'pending',
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    worker      TEXT,
+    claim_until REAL NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL,
+    result      TEXT,
+    error       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, id);
+CREATE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs (kind, params, status);
+"""
+
+_handlers = {}
+_wake = threading.Event()
+_stop = threading.Event()
+_consumer = {'thread': None, 'lease': None}
+
+
+def _log(msg: str):
+    print(f"[jobs] {msg}", file=sys.stderr)
+
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(JOBS_DB), exist_ok=True)
+    conn = sqlite3.connect(JOBS_DB, timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _row(row) -> dict:
+    job = dict(row)
+    job['params'] = json.loads(job['params'])
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+
+def register(kind: str, handler):
+    """handler(**params) runs jobs of this kind; its JSON-serialisable return value is stored as the result."""
+    _handlers[kind] = handler
+
+
+# ---- Producer side ----
+
+def enqueue(kind: str, params: dict = None, dedupe_running: bool = True, once: bool = False) -> tuple:
+    """
+    Queue a job and return (job_id, created). If an identical job (same kind
+    and params) is already pending, or running unless dedupe_running is off,
+    its id is returned instead. With once, an identical job in any status,
+    done or failed included, counts, so the job is only ever queued once.
+    """
+    params_json = json.dumps(params or {}, sort_keys=True)
+    if once:
+        statuses = "('pending', 'running', 'done', 'failed')"
+    else:
+        statuses = "('pending', 'running')" if dedupe_running else "('pending')"
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                f"SELECT id FROM jobs WHERE kind = ? AND params = ? AND status IN {statuses} "
+                "ORDER BY id LIMIT 1",
+                (kind, params_json),
+            ).fetchone()
+            if row:
+                conn.execute("COMMIT")
+                return row['id'], False
+            cur = conn.execute(
+                "INSERT INTO jobs (kind, params, created_at) VALUES (?, ?, ?)",
+                (kind, params_json, time.time()),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    _wake.set()
+    return cur.lastrowid, True
+
+
+def get(job_id: int) -> dict | None:
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row(row) if row else None
+    finally:
+        conn.close()
+
+
+def recent(limit: int = 20) -> list:
+    conn = _connect()
+    try:
+        return [_row(r) for r in conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))]
+    finally:
+        conn.close()
+
+
+# ---- Consumer side ----
+
+def _requeue_abandoned(conn):
+    """Jobs whose claim lapsed (their worker died) go back to pending, or fail after MAX_ATTEMPTS."""
+    now = time.time()
+    conn.execute(
+        "UPDATE jobs SET status = 'failed', finished_at = ?, error = 'abandoned too many times' "
+        "WHERE status = 'running' AND claim_until < ? AND attempts >= ?",
+        (now, now, MAX_ATTEMPTS),
+    )
+    conn.execute(
+        "UPDATE jobs SET status = 'pending', worker = NULL WHERE status = 'running' AND claim_until < ?",
+        (now,),
+    )
+
+
+def _claim(conn, worker: str) -> dict | None:
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _requeue_abandoned(conn)
+        row = conn.execute("SELECT * FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1").fetchone()
+        if row:
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                "started_at = ?, claim_until = ? WHERE id = ?",
+                (worker, now, now + JOB_CLAIM_TTL, row['id']),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return _row(row) if row else None
+
+
+def _finish(job_id: int, worker: str, result=None, error: str = None):
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE id = ? AND worker = ?",
+            ('failed' if error else 'done', time.time(),
+             None if error else json.dumps(result), error, job_id, worker),
+        )
+    finally:
+        conn.close()
+
+
+def _execute(job: dict, worker: str):
+    handler = _handlers.get(job['kind'])
+    if handler is None:
+        _finish(job['id'], worker, error=f"no handler for job kind '{job['kind']}'")
+        return
+    try:
+        result = handler(**job['params'])
+    except Exception as exc:
+        _log(f"job {job['id']} ({job['kind']}) failed: {exc}")
+        _finish(job['id'], worker, error=str(exc))
+    else:
+        _finish(job['id'], worker, result=result)
+
+
+def _consume(lease, worker: str, concurrency: int, poll: float):
+    """Claim and run jobs until this worker loses the host's consumer lease."""
+    active = {}
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='job') as pool:
+        while not lease.lost and not _stop.is_set():
+            conn = _connect()
+            try:
+                if active:
+                    conn.execute(
+                        f"UPDATE jobs SET claim_until = ? WHERE id IN ({','.join('?' * len(active))}) "
+                        "AND worker = ?",
+                        (time.time() + JOB_CLAIM_TTL, *active.values(), worker),
+                    )
+                while len(active) < concurrency:
+                    job = _claim(conn, worker)
+                    if job is None:
+                        break
+                    _log(f"running job {job['id']} ({job['kind']} {job['params']})")
+                    active[pool.submit(_execute, job, worker)] = job['id']
+            finally:
+                conn.close()
+
+            if active:
+                done, _ = wait(active, timeout=poll, return_when=FIRST_COMPLETED)
+                for future in done:
+                    active.pop(future)
+            else:
+                _wake.wait(poll)
+                _wake.clear()
+
+
+def start_consumer(concurrency: int = JOB_CONCURRENCY, poll: float = JOB_POLL) -> threading.Thread:
+    """
+    Start this worker's consumer thread. Only the worker holding the host's
+    consumer lease runs jobs; the rest wait and take over if it goes away.
+    """
+    host = socket.gethostname()
+    worker = f"{host}:{os.getpid()}"
+
+    def _run():
+        while not _stop.is_set():
+            lease = leases.acquire(f'job-consumer:{host}')
+            if lease is None:
+                _stop.wait(poll * 6)
+                continue
+            _consumer['lease'] = lease
+            try:
+                _consume(lease, worker, max(1, concurrency), poll)
+            except Exception as exc:
+                _log(f"consumer error: {exc}")
+                _stop.wait(poll)
+            finally:
+                _consumer['lease'] = None
+                lease.release()
+
+    _stop.clear()
+    thread = threading.Thread(target=_run, name='job-consumer', daemon=True)
+    thread.start()
+    _consumer['thread'] = thread
+    return thread
+
+
+def stop_consumer(timeout: float = 5):
+    """
+    Stop claiming jobs and hand the host's consumer lease back, so another
+    worker takes over at once instead of after LEASE_TTL. Jobs still running
+    get `timeout` seconds to finish; if they don't, the lease is released
+    anyway and their claims lapse as if the worker had died.
+    """
+    _stop.set()
+    _wake.set()
+    thread, lease = _consumer['thread'], _consumer['lease']
+    if thread is not None:
+        thread.join(timeout)
+    if lease is not None:
+        lease.release()
+
+
+def _cli():
+    import argparse
+    parser = argparse.ArgumentParser(description="Inspect the background job queue")
+    parser.add_argument('--list', action='store_true', help='Show the most recent jobs')
+    parser.add_argument('--show', metavar='ID', type=int, help='Show one job in full')
+    args = parser.parse_args()
+
+    if args.show:
+        print(json.dumps(get(args.show), indent=2, default=str))
+        return
+
+    if args.list:
+        print(f"{'ID':>5} {'KIND':<14} {'STATUS':<8} {'TRIES':>5}  PARAMS")
+        for job in recent():
+            print(f"{job['id']:>5} {job['kind']:<14} {job['status']:<8} {job['attempts']:>5}  {job['params']}")
+        return
+
+    parser.print_help()
+
+
+if __name__ == '__main__':
+    _cli()
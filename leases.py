@@ -0,0 +1,231 @@
+"""
+Cross-worker leases for getmeoutofhere.live
+
+Every gunicorn worker runs its own APScheduler, so a job that must happen
+once (blog generation) needs a lock that all workers can see. A lease is a
+row in data/leases.db naming its owner and an expiry time. Taking it is one
+BEGIN IMMEDIATE transaction, so exactly one worker wins. While the job runs,
+a heartbeat thread keeps extending the expiry. If the owner dies, the lease
+lapses after LEASE_TTL and the next worker can take it.
+
+When the winner releases the lease it stores a small JSON result next to it.
+The other workers read that result through last_result() or status()
+instead of redoing the work.
+
+CLI usage:
+    python leases.py --status blog-generation   # who holds it, last result
+    python leases.py --contend 8                # race 8 processes for one lease
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+# ---- Paths / tuning ----
+_HERE      = os.path.dirname(os.path.abspath(__file__))
+LEASES_DB  = os.path.join(_HERE, 'data', 'leases.db')
+LEASE_TTL  = 120     # seconds a lease survives without a heartbeat
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name         TEXT PRIMARY KEY,
+    owner        TEXT NOT NULL,
+    acquired_at  REAL NOT NULL,
+    heartbeat_at REAL NOT NULL,
+    expires_at   REAL NOT NULL,
+    result       TEXT,
+    finished_at  REAL
+);
+"""
+
+
+def _log(msg: str):
+    print(f"[leases] {msg}", file=sys.stderr)
+
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(LEASES_DB), exist_ok=True)
+    conn = sqlite3.connect(LEASES_DB, timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+class Lease:
+    """A held lease. Heartbeats until release(); `lost` turns true if another worker took it over."""
+
+    def __init__(self, name: str, owner: str, ttl: float):
+        self.name = name
+        self.owner = owner
+        self.ttl = ttl
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, name=f'lease-{name}', daemon=True)
+        self._thread.start()
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                conn = _connect()
+                try:
+                    now = time.time()
+                    cur = conn.execute(
+                        "UPDATE leases SET heartbeat_at = ?, expires_at = ? WHERE name = ? AND owner = ?",
+                        (now, now + self.ttl, self.name, self.owner),
+                    )
+                finally:
+                    conn.close()
+            except sqlite3.Error as exc:
+                _log(f"heartbeat for {self.name} failed: {exc}")
+                continue
+            if cur.rowcount == 0:
+                self.lost = True
+                _log(f"lease {self.name} was taken over while {self.owner} held it")
+                return
+
+    def release(self, result=None):
+        """Give the lease up, publishing `result` (JSON-serialisable) to the other workers."""
+        self._stop.set()
+        conn = _connect()
+        try:
+            conn.execute(
+                "UPDATE leases SET expires_at = 0, finished_at = ?, result = ? WHERE name = ? AND owner = ?",
+                (time.time(), json.dumps(result), self.name, self.owner),
+            )
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._stop.is_set():
+            self.release({'error': str(exc)} if exc else None)
+
+
+def acquire(name: str, ttl: float = LEASE_TTL):
+    """Take the lease called `name`, or return None if a live owner already holds it."""
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row and row['expires_at'] > now:
+                conn.execute("ROLLBACK")
+                return None
+            conn.execute(
+                """
+                INSERT INTO leases (name, owner, acquired_at, heartbeat_at, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    owner        = excluded.owner,
+                    acquired_at  = excluded.acquired_at,
+                    heartbeat_at = excluded.heartbeat_at,
+                    expires_at   = excluded.expires_at
+                """,
+                (name, owner, now, now, now + ttl),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return Lease(name, owner, ttl)
+
+
+def status(name: str) -> dict | None:
+    """The lease row as a dict (with `held` and the decoded `result`), or None if never taken."""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM leases WHERE name = ?", (name,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    info = dict(row)
+    info['held'] = info['expires_at'] > time.time()
+    info['result'] = json.loads(info['result']) if info['result'] else None
+    return info
+
+
+def last_result(name: str):
+    """What the most recent holder of `name` published when it released, or None."""
+    info = status(name)
+    return info['result'] if info else None
+
+
+# ---- CLI ----
+
+def _contend_worker(name: str, barrier, hold: float, out):
+    barrier.wait()
+    lease = acquire(name, ttl=max(hold * 2, 1))
+    if lease is None:
+        out.put((os.getpid(), False))
+        return
+    time.sleep(hold)
+    lease.release({'winner': os.getpid()})
+    out.put((os.getpid(), True))
+
+
+def _contend(n: int, hold: float = 1.0) -> bool:
+    """Start n processes at the same instant racing for one lease; True if exactly one won."""
+    import multiprocessing as mp
+    name = f"contend-{uuid.uuid4().hex[:8]}"
+    barrier, out = mp.Barrier(n), mp.Queue()
+    procs = [mp.Process(target=_contend_worker, args=(name, barrier, hold, out)) for _ in range(n)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    outcomes = [out.get() for _ in procs]
+    winners = [pid for pid, won in outcomes if won]
+    published = last_result(name)
+    print(f"[leases] {n} processes, {len(winners)} winner(s): {winners}; published result: {published}")
+
+    # A lease whose owner died without releasing must lapse after its TTL
+    lease = acquire(name, ttl=1)
+    lease._stop.set()   # simulate a crashed owner: no heartbeat, no release
+    blocked = acquire(name) is None
+    time.sleep(1.1)
+    retaken = acquire(name)
+    if retaken:
+        retaken.release()
+    print(f"[leases] held lease blocks others: {blocked}; expired lease can be retaken: {retaken is not None}")
+
+    conn = _connect()
+    try:
+        conn.execute("DELETE FROM leases WHERE name = ?", (name,))
+    finally:
+        conn.close()
+    return len(winners) == 1 and published == {'winner': winners[0]} and blocked and retaken is not None
+
+
+def _cli():
+    import argparse
+    parser = argparse.ArgumentParser(description="Inspect and exercise cross-worker leases")
+    parser.add_argument('--status', metavar='NAME', help='Show the holder and last result of a lease')
+    parser.add_argument('--contend', metavar='N', type=int,
+                        help='Race N processes for one lease and check exactly one wins')
+    args = parser.parse_args()
+
+    if args.status:
+        print(json.dumps(status(args.status), indent=2, default=str))
+        return
+
+    if args.contend:
+        sys.exit(0 if _contend(args.contend) else 1)
+
+    parser.print_help()
+
+
+if __name__ == '__main__':
+    _cli()
@@ -0,0 +1,148 @@
+"""
+Persistence for generated blog posts on getmeoutofhere.live
+
+Render's filesystem is ephemeral, so posts written to data/blog/ have to be
+saved somewhere that survives a redeploy. persist() collects every post
+that changed since the last save and writes them in one batch:
+
+    git  one commit covering just the changed data/blog/*.json files (default)
+    dir  an object-store style directory: blog/<slug>.json objects plus a
+         manifest of SHA-256 hashes, so unchanged posts are never rewritten
+
+app.py runs persist() as a background job after each generation run, so git
+never runs inside a request or scheduler thread. Runs are serialised by the
+'post-store' lease, which keeps two workers out of the git index at once.
+
+CLI usage:
+    python post_store.py                 # persist with POST_STORE_BACKEND
+    python post_store.py --backend dir   # mirror posts into POST_STORE_DIR
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+import leases
+
+# ---- Paths / tuning ----
+_HERE         = os.path.dirname(os.path.abspath(__file__))
+BLOG_DIR      = os.path.join(_HERE, 'data', 'blog')
+BACKEND       = os.environ.get('POST_STORE_BACKEND', 'git')
+STORE_DIR     = os.environ.get('POST_STORE_DIR', os.path.join(_HERE, 'data', 'post_store'))
+GIT_TIMEOUT   = 60      # seconds per git command
+LOCK_WAIT     = 120     # seconds to wait for another worker's persist to finish
+
+
+def _log(msg: str):
+    print(f"[post_store] {msg}", file=sys.stderr)
+
+
+def _git(*args) -> subprocess.CompletedProcess:
+    result = subprocess.run(['git', *args], cwd=_HERE, capture_output=True, text=True, timeout=GIT_TIMEOUT)
+    if result.returncode != 0:
+        raise RuntimeError(f"git {args[0]} failed: {result.stderr.strip() or result.stdout.strip()}")
+    return result
+
+
+# ---- Backends ----
+
+def _persist_git(message: str = None) -> dict:
+    """Commit new and modified posts (and only those paths) in one commit."""
+    blog_rel = os.path.relpath(BLOG_DIR, _HERE)
+    status = _git('status', '--porcelain', '-z', '--untracked-files=all', '--', blog_rel).stdout
+    paths = sorted({
+        entry[3:] for entry in status.split('\0')
+        if entry[3:].endswith('.json') and entry[:2].strip() not in ('D', '')
+    })
+    if not paths:
+        return {'backend': 'git', 'persisted': 0}
+
+    slugs = [os.path.basename(p)[:-5] for p in paths]
+    message = message or (f"Auto-generated blog post{'s' if len(slugs) != 1 else ''}: "
+                          + ', '.join(slugs[:5]) + (f" (+{len(slugs) - 5} more)" if len(slugs) > 5 else ''))
+    _git('add', '--', *paths)
+    _git('commit', '-m', message, '--', *paths)
+    return {'backend': 'git', 'persisted': len(paths), 'slugs': slugs}
+
+
+def _persist_dir(message: str = None) -> dict:
+    """Copy changed posts into STORE_DIR/blog/, tracked by a SHA-256 manifest."""
+    manifest_path = os.path.join(STORE_DIR, 'manifest.json')
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    os.makedirs(os.path.join(STORE_DIR, 'blog'), exist_ok=True)
+    slugs = []
+    for fn in sorted(os.listdir(BLOG_DIR)) if os.path.isdir(BLOG_DIR) else []:
+        if not fn.endswith('.json') or fn.startswith('.'):
+            continue
+        with open(os.path.join(BLOG_DIR, fn), 'rb') as f:
+            body = f.read()
+        key = f"blog/{fn}"
+        digest = hashlib.sha256(body).hexdigest()
+        if manifest.get(key, {}).get('sha256') == digest:
+            continue
+        _write_atomic(os.path.join(STORE_DIR, key), body)
+        manifest[key] = {'sha256': digest, 'size': len(body), 'stored_at': time.time()}
+        slugs.append(fn[:-5])
+
+    if slugs:
+        _write_atomic(manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return {'backend': 'dir', 'persisted': len(slugs), 'slugs': slugs}
+
+
+def _write_atomic(path: str, body: bytes):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+_BACKENDS = {'git': _persist_git, 'dir': _persist_dir}
+
+
+def persist(backend: str = None, message: str = None) -> dict:
+    """
+    Save every post changed since the last run with `backend` ('git' or 'dir').
+    Returns {backend, persisted, slugs}; raises if the backend fails.
+    """
+    backend = backend or BACKEND
+    if backend not in _BACKENDS:
+        raise ValueError(f"unknown post store backend '{backend}'")
+
+    deadline = time.time() + LOCK_WAIT
+    lease = leases.acquire('post-store')
+    while lease is None:
+        if time.time() > deadline:
+            raise RuntimeError("timed out waiting for another worker's persist to finish")
+        time.sleep(2)
+        lease = leases.acquire('post-store')
+
+    with lease:
+        result = _BACKENDS[backend](message)
+        lease.release(result)
+    if result['persisted']:
+        _log(f"persisted {result['persisted']} post(s) via {backend}")
+    return result
+
+
+def _cli():
+    import argparse
+    parser = argparse.ArgumentParser(description="Persist generated blog posts")
+    parser.add_argument('--backend', choices=sorted(_BACKENDS), default=BACKEND,
+                        help=f'Where to save posts (default {BACKEND})')
+    parser.add_argument('--message', help='Commit message for the git backend')
+    args = parser.parse_args()
+    print(json.dumps(persist(args.backend, args.message), indent=2))
+
+
+if __name__ == '__main__':
+    _cli()
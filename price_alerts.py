@@ -0,0 +1,269 @@
+"""
+Price-alert engine for getmeoutofhere.live
+
+Runs once a day from the APScheduler in app.py. Subscribers are grouped by
+their airport. Each distinct airport is fetched exactly once through the
+fare source and compared with the snapshot from the previous run. Meaningful
+drops go into one digest per subscriber, so upstream cost scales with the
+number of airports, not the number of subscribers.
+
+Digests are stored in data/price_alerts.db for the mailer to pick up. The
+fare source is passed in, so a plain function returning canned fares is
+enough to exercise the whole run locally.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import subscribers
+
+# ---- Paths / tuning ----
+_HERE      = os.path.dirname(os.path.abspath(__file__))
+ALERTS_DB  = os.path.join(_HERE, 'data', 'price_alerts.db')
+
+MIN_DROP_PCT      = 0.15   # price must fall by at least 15% ...
+MIN_DROP_ABS      = 10     # ... and by at least 10 units of currency
+MAX_DROPS_PER_DIGEST = 5
+RUN_CLAIM_TTL     = 1800   # seconds without progress before another worker may take a run over
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fare_snapshots (
+    origin      TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    currency    TEXT NOT NULL,
+    price       REAL NOT NULL,
+    depart_date TEXT NOT NULL DEFAULT '',
+    observed_at REAL NOT NULL,
+    PRIMARY KEY (origin, destination, currency)
+);
+CREATE TABLE IF NOT EXISTS alert_digests (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    email        TEXT NOT NULL,
+    airport_code TEXT NOT NULL,
+    run_date     TEXT NOT NULL,
+    payload      TEXT NOT NULL,
+    sent_at      REAL
+);
+CREATE INDEX IF NOT EXISTS idx_alert_digests_unsent ON alert_digests (sent_at, run_date);
+CREATE TABLE IF NOT EXISTS alert_runs (
+    run_date    TEXT PRIMARY KEY,
+    started_at  REAL NOT NULL,      -- refreshed after each origin while the run is alive
+    finished_at REAL,
+    stats       TEXT
+);
+"""
+
+
+def _log(msg: str):
+    print(f"[price_alerts] {msg}", file=sys.stderr)
+
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(ALERTS_DB), exist_ok=True)
+    conn = sqlite3.connect(ALERTS_DB, timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+# ---- Diffing ----
+
+def _cheapest_by_destination(fares: list) -> dict:
+    """Collapse raw Travelpayouts fares to {destination: fare} keeping the cheapest."""
+    best = {}
+    for f in fares or []:
+        dest = f.get('destination')
+        price = f.get('value')
+        if not dest or not isinstance(price, (int, float)) or price <= 0:
+            continue
+        if dest not in best or price < best[dest]['value']:
+            best[dest] = f
+    return best
+
+
+def find_drops(previous: dict, current: dict) -> list:
+    """
+    Compare {destination: price} snapshots and return meaningful drops,
+    biggest percentage first, as dicts with destination/old_price/new_price/pct.
+    """
+    drops = []
+    for dest, new_price in current.items():
+        old_price = previous.get(dest)
+        if not old_price:
+            continue
+        saving = old_price - new_price
+        if saving >= MIN_DROP_ABS and saving >= old_price * MIN_DROP_PCT:
+            drops.append({
+                'destination': dest,
+                'old_price': old_price,
+                'new_price': new_price,
+                'pct': round(saving / old_price * 100),
+            })
+    drops.sort(key=lambda d: -d['pct'])
+    return drops
+
+
+def _load_snapshot(conn, origin: str, currency: str) -> dict:
+    rows = conn.execute(
+        "SELECT destination, price FROM fare_snapshots WHERE origin = ? AND currency = ?",
+        (origin, currency),
+    ).fetchall()
+    return {r['destination']: r['price'] for r in rows}
+
+
+def _save_snapshot(conn, origin: str, currency: str, fares: dict, now: float):
+    """Replace the origin's snapshot; runs inside the caller's transaction."""
+    conn.execute("DELETE FROM fare_snapshots WHERE origin = ? AND currency = ?", (origin, currency))
+    conn.executemany(
+        """
+        INSERT INTO fare_snapshots (origin, destination, currency, price, depart_date, observed_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        [(origin, dest, currency, f['value'], (f.get('depart_date') or '')[:10], now)
+         for dest, f in fares.items()],
+    )
+
+
+# ---- Run ----
+
+def _claim_run(conn, run_date: str) -> bool:
+    """
+    True for exactly one caller per run_date, however many workers try. A
+    claim whose run never finished and has made no progress for
+    RUN_CLAIM_TTL (its worker died) can be taken over.
+    """
+    now = time.time()
+    cur = conn.execute(
+        "INSERT OR IGNORE INTO alert_runs (run_date, started_at) VALUES (?, ?)",
+        (run_date, now),
+    )
+    if cur.rowcount == 1:
+        return True
+    cur = conn.execute(
+        "UPDATE alert_runs SET started_at = ? "
+        "WHERE run_date = ? AND finished_at IS NULL AND started_at < ?",
+        (now, run_date, now - RUN_CLAIM_TTL),
+    )
+    if cur.rowcount == 1:
+        _log(f"run {run_date}: taking over a stale claim")
+    return cur.rowcount == 1
+
+
+def _alert_origin(conn, origin: str, currency: str, fares: list, run_date: str) -> tuple:
+    """
+    Diff one origin's fares against its snapshot and queue digests for its
+    subscribers. The new snapshot and the digests commit together, so a
+    failure part-way loses neither. Returns (drops, digests).
+    """
+    current = _cheapest_by_destination(fares)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        previous = _load_snapshot(conn, origin, currency)
+        drops = find_drops(previous, {d: f['value'] for d, f in current.items()})
+        _save_snapshot(conn, origin, currency, current, time.time())
+        digests = 0
+        if drops:
+            payload = json.dumps({
+                'airport_code': origin,
+                'currency': currency,
+                'drops': drops[:MAX_DROPS_PER_DIGEST],
+            }, ensure_ascii=False)
+            batch = []
+            for sub in subscribers.iter_airport(origin):
+                batch.append((sub['email'], origin, run_date, payload))
+                if len(batch) >= 1000:
+                    digests += _write_digests(conn, batch)
+                    batch = []
+            if batch:
+                digests += _write_digests(conn, batch)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return len(drops), digests
+
+
+def run(fare_source, currency_for=lambda code: 'gbp', run_date: str = None, force: bool = False) -> dict:
+    """
+    Compute today's price-alert digests.
+
+    fare_source(origin, currency) -> list of raw fare dicts (Travelpayouts
+    shape: destination, value, depart_date), or None on failure.
+    currency_for(origin) -> currency code to price that origin in.
+
+    Returns stats: origins, fetched, failed, drops, digests. A run_date is
+    processed only once unless force is set; an origin whose fetch or diff
+    fails is logged and skipped, keeping its old snapshot for next time.
+    """
+    run_date = run_date or datetime.utcnow().strftime('%Y-%m-%d')
+    conn = _connect()
+    try:
+        if force:
+            conn.execute("DELETE FROM alert_runs WHERE run_date = ?", (run_date,))
+        if not _claim_run(conn, run_date):
+            return {'skipped': True}
+
+        stats = {'origins': 0, 'fetched': 0, 'failed': 0, 'drops': 0, 'digests': 0}
+        for origin in sorted(subscribers.airport_counts()):
+            stats['origins'] += 1
+            try:
+                currency = currency_for(origin)
+                fares = fare_source(origin, currency)
+                if fares is None:
+                    stats['failed'] += 1   # upstream failure: keep the old snapshot for next time
+                    continue
+                stats['fetched'] += 1
+                drops, digests = _alert_origin(conn, origin, currency, fares, run_date)
+                stats['drops'] += drops
+                stats['digests'] += digests
+            except Exception as exc:
+                stats['failed'] += 1
+                _log(f"run {run_date}: {origin} failed: {exc}")
+            finally:
+                conn.execute("UPDATE alert_runs SET started_at = ? WHERE run_date = ?",
+                             (time.time(), run_date))
+
+        conn.execute(
+            "UPDATE alert_runs SET finished_at = ?, stats = ? WHERE run_date = ?",
+            (time.time(), json.dumps(stats), run_date),
+        )
+        _log(f"run {run_date}: {stats}")
+        return stats
+    finally:
+        conn.close()
+
+
+def _write_digests(conn, rows: list) -> int:
+    conn.executemany(
+        "INSERT INTO alert_digests (email, airport_code, run_date, payload) VALUES (?, ?, ?, ?)",
+        rows,
+    )
+    return len(rows)
+
+
+def pending_digests(limit: int = 500) -> list:
+    """Unsent digests, oldest first, for the mailer."""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT id, email, airport_code, run_date, payload FROM alert_digests "
+            "WHERE sent_at IS NULL ORDER BY run_date, id LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [{**dict(r), 'payload': json.loads(r['payload'])} for r in rows]
+    finally:
+        conn.close()
+
+
+def mark_sent(ids: list):
+    conn = _connect()
+    try:
+        conn.executemany("UPDATE alert_digests SET sent_at = ? WHERE id = ?",
+                         [(time.time(), i) for i in ids])
+    finally:
+        conn.close()
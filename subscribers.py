@@ -0,0 +1,525 @@
+"""
+Price-alert subscribers for getmeoutofhere.live
+
+Signups from /subscribe are written to a local SQLite database (WAL mode),
+so the request returns as soon as the row is committed. A background flusher
+then syncs pending rows to Brevo and the Google Sheet in batches. It retries
+with backoff, and because there is one row per email, repeat signups are
+deduped.
+
+Several gunicorn workers can run a flusher against the same database. Each
+batch is claimed with a short lease first, so no row is sent twice at the
+same time.
+
+CLI usage:
+    python subscribers.py --flush          # sync pending signups now
+    python subscribers.py --export-sheet   # rewrite the sheet from the local store
+    python subscribers.py --import-csv     # one-shot import of data/subscribers.csv
+    python subscribers.py --airports       # subscriber counts per airport
+"""
+
+import csv
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+import gspread
+import requests
+from dotenv import load_dotenv
+from google.oauth2.service_account import Credentials as SACredentials
+load_dotenv()
+
+# ---- Paths / tuning ----
+_HERE            = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR         = os.path.join(_HERE, 'data')
+SUBSCRIBERS_DB   = os.path.join(DATA_DIR, 'subscribers.db')
+SUBSCRIBERS_FILE = os.path.join(DATA_DIR, 'subscribers.csv')   # legacy fallback file (see import_csv)
+
+FIELDS          = ['email', 'airport_code', 'airport_name', 'signed_up_at']
+FLUSH_INTERVAL  = 30      # seconds between flusher passes when idle
+FLUSH_BATCH     = 200     # rows per Brevo import / Sheets append
+FLUSH_LEASE     = 120     # seconds a claimed batch is reserved for one worker
+MAX_BACKOFF     = 3600    # cap on retry delay for a failing row
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscribers (
+    email           TEXT PRIMARY KEY,
+    airport_code    TEXT NOT NULL DEFAULT '',
+    airport_name    TEXT NOT NULL DEFAULT '',
+    signed_up_at    TEXT NOT NULL,
+    brevo_synced    INTEGER NOT NULL DEFAULT 0,
+    sheet_synced    INTEGER NOT NULL DEFAULT 0,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    lease_until     REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_subscribers_pending
+    ON subscribers (brevo_synced, sheet_synced, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_subscribers_airport
+    ON subscribers (airport_code, email);
+"""
+
+# Insert a signup, or update the airport of an existing email. The original
+# signed_up_at is kept; Brevo is re-synced because its attributes changed.
+_UPSERT_SQL = """
+INSERT INTO subscribers (email, airport_code, airport_name, signed_up_at)
+VALUES (?, ?, ?, ?)
+ON CONFLICT(email) DO UPDATE SET
+    airport_code    = excluded.airport_code,
+    airport_name    = excluded.airport_name,
+    brevo_synced    = 0,
+    attempts        = 0,
+    next_attempt_at = 0
+"""
+
+
+def _log(msg: str):
+    print(f"[subscribers] {msg}", file=sys.stderr)
+
+
+def _connect() -> sqlite3.Connection:
+    """Open the subscribers database, creating it (in WAL mode) on first use."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(SUBSCRIBERS_DB, timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+# ---- Google Sheets ----
+SHEET_HANDLE_TTL  = 3600   # seconds before the worksheet handle is re-opened
+SHEET_EXPORT_ROWS = 1000   # rows per range in a bulk export
+SHEET_EXPORT_RANGES_PER_CALL = 5   # ranges per batch_update request
+SHEET_EXPORT_PAUSE = 1.5   # seconds between export requests (write quota is per minute)
+
+_sheets_client = None
+_sheet_cache = {"ws": None, "fetched_at": 0}
+_sheet_lock = threading.Lock()
+
+def _get_sheet():
+    """Return the subscribers worksheet, caching the client and the handle.
+
+    The handle is reused for SHEET_HANDLE_TTL seconds or until a Sheets call
+    fails (see _invalidate_sheet).
+    """
+    global _sheets_client
+    creds_json = os.environ.get('GOOGLE_SHEETS_CREDENTIALS')
+    sheet_id   = os.environ.get('GOOGLE_SHEETS_SPREADSHEET_ID')
+    if not creds_json or not sheet_id:
+        return None
+    with _sheet_lock:
+        if _sheet_cache["ws"] is not None and time.time() - _sheet_cache["fetched_at"] < SHEET_HANDLE_TTL:
+            return _sheet_cache["ws"]
+        if _sheets_client is None:
+            info = json.loads(creds_json)
+            scopes = ['https://www.googleapis.com/auth/spreadsheets']
+            creds = SACredentials.from_service_account_info(info, scopes=scopes)
+            _sheets_client = gspread.authorize(creds)
+        spreadsheet = _sheets_client.open_by_key(sheet_id)
+        try:
+            ws = spreadsheet.worksheet('subscribers')
+        except gspread.WorksheetNotFound:
+            try:
+                ws = spreadsheet.add_worksheet(title='subscribers', rows=1, cols=len(FIELDS))
+                ws.update(values=[FIELDS], range_name='A1')
+            except gspread.exceptions.APIError:
+                # Another worker created it between our lookup and add — use theirs
+                ws = spreadsheet.worksheet('subscribers')
+        _sheet_cache.update({"ws": ws, "fetched_at": time.time()})
+        return ws
+
+
+def _invalidate_sheet():
+    """Drop the cached worksheet handle so the next call re-opens it."""
+    with _sheet_lock:
+        _sheet_cache.update({"ws": None, "fetched_at": 0})
+
+
+def _sheets_enabled() -> bool:
+    return bool(os.environ.get('GOOGLE_SHEETS_CREDENTIALS') and os.environ.get('GOOGLE_SHEETS_SPREADSHEET_ID'))
+
+
+# ---- Brevo ----
+def _brevo_enabled() -> bool:
+    return bool(os.environ.get('BREVO_API_KEY'))
+
+
+def _brevo_sync(rows: list) -> bool:
+    """Push contacts to Brevo in one request. Returns True if Brevo accepted them.
+
+    Uses the contacts import API when BREVO_LIST_ID is set (it requires a
+    target list); otherwise falls back to one upsert per contact.
+    """
+    api_key = os.environ.get('BREVO_API_KEY')
+    headers = {'api-key': api_key, 'Content-Type': 'application/json'}
+    contacts = [{
+        'email': r['email'],
+        'attributes': {
+            'AIRPORT_CODE': r['airport_code'],
+            'AIRPORT_NAME': r['airport_name'],
+        },
+    } for r in rows]
+
+    list_id = os.environ.get('BREVO_LIST_ID')
+    if list_id:
+        resp = requests.post(
+            'https://api.brevo.com/v3/contacts/import',
+            json={
+                'jsonBody': contacts,
+                'listIds': [int(list_id)],
+                'updateExistingContacts': True,
+                'emptyContactsAttributes': False,
+            },
+            headers=headers,
+            timeout=30,
+        )
+        if resp.status_code not in (200, 201, 202, 204):
+            _log(f"Brevo import {resp.status_code}: {resp.text}")
+            return False
+        return True
+
+    ok = True
+    with requests.Session() as session:
+        for contact in contacts:
+            resp = session.post(
+                'https://api.brevo.com/v3/contacts',
+                json={**contact, 'updateEnabled': True},
+                headers=headers,
+                timeout=8,
+            )
+            if resp.status_code not in (201, 204):
+                _log(f"Brevo {resp.status_code}: {resp.text}")
+                ok = False
+    return ok
+
+
+# ---- Queue ----
+_wake = threading.Event()
+
+def enqueue(email: str, airport_code: str = '', airport_name: str = '') -> None:
+    """Record a signup durably. A repeat signup updates the airport and re-syncs Brevo."""
+    now = datetime.utcnow().isoformat()
+    conn = _connect()
+    try:
+        conn.execute(_UPSERT_SQL, (email, airport_code, airport_name, now))
+    finally:
+        conn.close()
+    _wake.set()
+
+
+def _claim_batch(conn, limit: int) -> list:
+    """Reserve up to `limit` due rows for this worker and return them."""
+    now = time.time()
+    need_brevo, need_sheet = _brevo_enabled(), _sheets_enabled()
+    if not (need_brevo or need_sheet):
+        return []
+    pending = []
+    if need_brevo:
+        pending.append("brevo_synced = 0")
+    if need_sheet:
+        pending.append("sheet_synced = 0")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(
+            f"""
+            SELECT * FROM subscribers
+            WHERE ({' OR '.join(pending)}) AND next_attempt_at <= ? AND lease_until <= ?
+            ORDER BY signed_up_at LIMIT ?
+            """,
+            (now, now, limit),
+        ).fetchall()
+        conn.executemany(
+            "UPDATE subscribers SET lease_until = ? WHERE email = ?",
+            [(now + FLUSH_LEASE, r['email']) for r in rows],
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return [dict(r) for r in rows]
+
+
+def flush_pending(batch_size: int = FLUSH_BATCH) -> dict:
+    """Sync one batch of pending signups to Brevo and Sheets. Returns counts."""
+    conn = _connect()
+    try:
+        rows = _claim_batch(conn, batch_size)
+        if not rows:
+            return {'brevo': 0, 'sheet': 0, 'failed': 0}
+
+        brevo_rows = [r for r in rows if not r['brevo_synced']] if _brevo_enabled() else []
+        sheet_rows = [r for r in rows if not r['sheet_synced']] if _sheets_enabled() else []
+
+        brevo_ok = True
+        if brevo_rows:
+            try:
+                brevo_ok = _brevo_sync(brevo_rows)
+            except Exception as exc:
+                _log(f"Brevo error: {exc}")
+                brevo_ok = False
+
+        sheet_ok = True
+        if sheet_rows:
+            try:
+                ws = _get_sheet()
+                ws.append_rows([[r[f] for f in FIELDS] for r in sheet_rows], value_input_option='RAW')
+            except Exception as exc:
+                _log(f"Sheets error: {exc}")
+                _invalidate_sheet()
+                sheet_ok = False
+
+        now = time.time()
+        brevo_emails = {r['email'] for r in brevo_rows}
+        sheet_emails = {r['email'] for r in sheet_rows}
+        updates = []
+        for r in rows:
+            in_brevo, in_sheet = r['email'] in brevo_emails, r['email'] in sheet_emails
+            brevo = r['brevo_synced'] or (brevo_ok and in_brevo)
+            sheet = r['sheet_synced'] or (sheet_ok and in_sheet)
+            failed = (in_brevo and not brevo_ok) or (in_sheet and not sheet_ok)
+            attempts = r['attempts'] + 1 if failed else 0
+            retry_at = now + min(MAX_BACKOFF, 30 * 2 ** attempts) if failed else 0
+            updates.append((int(bool(brevo)), int(bool(sheet)), attempts, retry_at, r['email']))
+        conn.executemany(
+            """
+            UPDATE subscribers
+            SET brevo_synced = ?, sheet_synced = ?, attempts = ?, next_attempt_at = ?, lease_until = 0
+            WHERE email = ?
+            """,
+            updates,
+        )
+        return {
+            'brevo': len(brevo_rows) if brevo_ok else 0,
+            'sheet': len(sheet_rows) if sheet_ok else 0,
+            'failed': sum(1 for u in updates if u[2]),
+        }
+    finally:
+        conn.close()
+
+
+def start_flusher(interval: int = FLUSH_INTERVAL) -> threading.Thread:
+    """Start a daemon thread that drains the queue, waking early on new signups."""
+    def _run():
+        while True:
+            _wake.wait(interval)
+            _wake.clear()
+            time.sleep(2)   # let a burst of signups land in the same batch
+            try:
+                while True:
+                    result = flush_pending()
+                    if not any(result.values()) or result['failed']:
+                        break
+            except Exception as exc:
+                _log(f"flusher error: {exc}")
+    thread = threading.Thread(target=_run, name='subscriber-flusher', daemon=True)
+    thread.start()
+    return thread
+
+
+# ---- Lookups for alert fan-out ----
+
+def airport_counts() -> dict:
+    """Return {airport_code: subscriber_count} for every airport with subscribers."""
+    conn = _connect()
+    try:
+        return dict(conn.execute(
+            "SELECT airport_code, COUNT(*) FROM subscribers WHERE airport_code != '' GROUP BY airport_code"
+        ).fetchall())
+    finally:
+        conn.close()
+
+
+def iter_airport(airport_code: str, batch: int = 500):
+    """Yield subscriber dicts for one airport, reading `batch` rows at a time.
+
+    Walks idx_subscribers_airport by email with keyset pagination, so memory
+    stays flat however many subscribers an airport has.
+    """
+    airport_code = (airport_code or '').upper()
+    last_email = ''
+    conn = _connect()
+    try:
+        while True:
+            rows = conn.execute(
+                f"""
+                SELECT {', '.join(FIELDS)} FROM subscribers
+                WHERE airport_code = ? AND email > ?
+                ORDER BY email LIMIT ?
+                """,
+                (airport_code, last_email, batch),
+            ).fetchall()
+            if not rows:
+                return
+            for r in rows:
+                yield dict(r)
+            last_email = rows[-1]['email']
+    finally:
+        conn.close()
+
+
+def get(email: str) -> dict | None:
+    """Return the subscriber row for `email`, or None."""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM subscribers WHERE email = ?", ((email or '').strip().lower(),)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def import_csv(path: str = SUBSCRIBERS_FILE, batch: int = 5000) -> int:
+    """
+    One-shot import of the legacy subscribers.csv into the store.
+
+    Streams the file and upserts `batch` rows per transaction. Duplicate
+    emails resolve to the last row seen. Imported rows are queued for Brevo
+    and Sheets, because the CSV only ever held signups Brevo had rejected.
+    Returns the number of rows read.
+    """
+    if not os.path.exists(path):
+        return 0
+    conn = _connect()
+    count = 0
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            chunk = []
+            for row in reader:
+                email = (row.get('email') or '').strip().lower()
+                if not email or '@' not in email:
+                    continue
+                chunk.append((
+                    email,
+                    (row.get('airport_code') or '').strip().upper(),
+                    (row.get('airport_name') or '').strip(),
+                    (row.get('signed_up_at') or '').strip() or datetime.utcnow().isoformat(),
+                ))
+                if len(chunk) >= batch:
+                    _upsert_many(conn, chunk)
+                    count += len(chunk)
+                    chunk = []
+            if chunk:
+                _upsert_many(conn, chunk)
+                count += len(chunk)
+    finally:
+        conn.close()
+    _wake.set()
+    return count
+
+
+def _upsert_many(conn, rows: list):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(_UPSERT_SQL, rows)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+# ---- Bulk export ----
+
+def export_to_sheet(chunk_rows: int = SHEET_EXPORT_ROWS) -> int:
+    """
+    Rewrite the whole subscribers sheet from the local store.
+
+    Rows are streamed from SQLite and written with worksheet.batch_update,
+    several ranges of `chunk_rows` rows per request, instead of one append per
+    signup. Everything exported is marked as synced to Sheets. Returns the
+    number of rows written.
+    """
+    ws = _get_sheet()
+    if ws is None:
+        raise RuntimeError("GOOGLE_SHEETS_CREDENTIALS / GOOGLE_SHEETS_SPREADSHEET_ID not set")
+
+    conn = _connect()
+    try:
+        snapshot = conn.execute("SELECT COUNT(*), COALESCE(MAX(rowid), 0) FROM subscribers").fetchone()
+        total, max_rowid = snapshot[0], snapshot[1]
+        try:
+            ws.resize(rows=total + 1, cols=len(FIELDS))
+            ws.update(values=[FIELDS], range_name='A1')
+
+            cur = conn.execute(
+                f"SELECT {', '.join(FIELDS)} FROM subscribers WHERE rowid <= ? ORDER BY signed_up_at",
+                (max_rowid,),
+            )
+            written, pending = 0, []
+            while True:
+                chunk = cur.fetchmany(chunk_rows)
+                if chunk:
+                    start = written + 2   # row 1 is the header
+                    pending.append({
+                        'range': f"A{start}:D{start + len(chunk) - 1}",
+                        'values': [list(r) for r in chunk],
+                    })
+                    written += len(chunk)
+                if pending and (len(pending) >= SHEET_EXPORT_RANGES_PER_CALL or not chunk):
+                    ws.batch_update(pending, value_input_option='RAW')
+                    pending = []
+                    if chunk:
+                        time.sleep(SHEET_EXPORT_PAUSE)
+                if not chunk:
+                    break
+        except Exception:
+            _invalidate_sheet()
+            raise
+
+        conn.execute("UPDATE subscribers SET sheet_synced = 1 WHERE rowid <= ?", (max_rowid,))
+        return written
+    finally:
+        conn.close()
+
+
+# ---- CLI ----
+
+def _cli():
+    import argparse
+    parser = argparse.ArgumentParser(description="Manage the local price-alert subscriber store")
+    parser.add_argument('--export-sheet', action='store_true',
+                        help='Rewrite the Google Sheet from the local store in chunked batch writes')
+    parser.add_argument('--flush', action='store_true',
+                        help='Sync all pending signups to Brevo/Sheets now')
+    parser.add_argument('--import-csv', metavar='PATH', nargs='?', const=SUBSCRIBERS_FILE,
+                        help='Import a legacy subscribers CSV (default: data/subscribers.csv)')
+    parser.add_argument('--airports', action='store_true',
+                        help='List subscriber counts per airport')
+    args = parser.parse_args()
+
+    if args.import_csv:
+        n = import_csv(args.import_csv)
+        print(f"[subscribers] Imported {n} row(s) from {args.import_csv}.")
+        return
+
+    if args.airports:
+        for code, n in sorted(airport_counts().items(), key=lambda x: -x[1]):
+            print(f"{code:<6} {n}")
+        return
+
+    if args.export_sheet:
+        n = export_to_sheet()
+        print(f"[subscribers] Exported {n} row(s) to Google Sheets.")
+        return
+
+    if args.flush:
+        totals = {'brevo': 0, 'sheet': 0, 'failed': 0}
+        while True:
+            result = flush_pending()
+            for k, v in result.items():
+                totals[k] += v
+            if not any(result.values()) or result['failed']:
+                break
+        print(f"[subscribers] Flushed: {totals}")
+        return
+
+    parser.print_help()
+
+
+if __name__ == '__main__':
+    _cli()
@@ -0,0 +1,30 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+POST_JSON = json.dumps({
+    "title": "Seville from £39", "subtitle": "Cheap", "airport_names": "Stansted",
+    "meta": "Seville and Porto from £39 one-way.",
+    "sections": [{"heading": f"Part {i}", "body": "Porto from £41 on Ryanair."} for i in range(4)],
+    "cta_airport": "STN",
+})
+
+
+@pytest.fixture
+def blog(tmp_path, monkeypatch):
+    """blog_generator with every file it writes moved under tmp_path and no shared state."""
+    import blog_generator
+    data = tmp_path / 'data'
+    (data / 'blog').mkdir(parents=True)
+    for name, path in [('BLOG_DIR', data / 'blog'), ('LOCK_FILE', data / '.blog_last_run'),
+                       ('PROGRESS_FILE', data / '.blog_progress.json'), ('GEN_CACHE_DIR', data / '.gen_cache'),
+                       ('BATCH_STATE_FILE', data / '.blog_batch.json')]:
+        monkeypatch.setattr(blog_generator, name, str(path))
+    monkeypatch.setattr(blog_generator, '_post_index', None)
+    monkeypatch.setattr(blog_generator, '_backoff_until', 0.0)
+    monkeypatch.setattr(blog_generator, 'USE_GEN_CACHE', False)
+    return blog_generator
@@ -0,0 +1,229 @@
+"""blog_generator runs against stub API clients (no network)."""
+
+import os
+import sys
+import threading
+import types
+
+import anthropic
+import httpx2
+import pytest
+
+from conftest import POST_JSON
+
+
+def _api_error(cls, status, headers=None):
+    response = httpx2.Response(status, headers=headers or {}, request=httpx2.Request('POST', 'https://api.test'))
+    return cls(f"HTTP {status}", response=response, body=None)
+
+
+class StubClient:
+    """messages.create answers from script(call_number, request) -> text, or raises what it returns."""
+
+    def __init__(self, script):
+        self.script = script
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.messages = types.SimpleNamespace(create=self._create)
+
+    def _create(self, **request):
+        with self._lock:
+            self.calls += 1
+            n = self.calls
+        result = self.script(n, request)
+        if isinstance(result, Exception):
+            raise result
+        return types.SimpleNamespace(content=[types.SimpleNamespace(text=result)], usage=None)
+
+
+def _saved(blog):
+    return sorted(f[:-5] for f in os.listdir(blog.BLOG_DIR) if f.endswith('.json'))
+
+
+# ── run_bulk (thread pool, shared backoff, failure cap, fatal stop) ─────────
+
+def test_bulk_rides_out_rate_limits_with_shared_backoff(blog, monkeypatch):
+    backoffs = []
+    monkeypatch.setattr(blog, '_backoff_until', 0.0)
+    rate_limited = _api_error(anthropic.RateLimitError, 429, {'retry-after': '0.01'})
+
+    def script(n, request):
+        if n <= 4:
+            backoffs.append(n)
+            return rate_limited
+        return POST_JSON
+
+    client = StubClient(script)
+    assert blog.run_bulk(n=4, force=True, workers=4, client=client) == 4
+    assert len(_saved(blog)) == 4
+    assert backoffs == [1, 2, 3, 4]
+    assert blog._backoff_until > 0      # one worker's 429 paused them all
+    assert client.calls == 8
+
+
+def test_bulk_stops_refilling_after_n_failures(blog):
+    client = StubClient(lambda n, request: RuntimeError('upstream broke'))
+    assert blog.run_bulk(n=3, force=True, workers=4, client=client) == 0
+    assert client.calls == 3
+    assert _saved(blog) == []
+
+
+def test_bulk_stops_on_fatal_error_and_keeps_finished_posts(blog):
+    fatal = _api_error(anthropic.AuthenticationError, 401)
+    client = StubClient(lambda n, request: POST_JSON if n <= 2 else fatal)
+
+    assert blog.run_bulk(n=10, force=True, workers=1, client=client) == 2
+    assert client.calls == 3                 # two posts, one 401, then nothing more
+    assert len(_saved(blog)) == 2
+    assert os.path.exists(blog.LOCK_FILE)
+
+
+def test_generate_post_raises_fatal_errors(blog):
+    client = StubClient(lambda n, request: _api_error(anthropic.BadRequestError, 400))
+    with pytest.raises(anthropic.BadRequestError):
+        blog.generate_post(blog.TOPIC_PIPELINE[0], client=client)
+
+
+# ── run_batch (saved state, recovery, abandoning a batch) ────────────────────
+
+class FakeBatches:
+    """A Message Batches endpoint; status(n) gives the batch status on the nth retrieve (or raises it)."""
+
+    def __init__(self, status, results=None, crash_after_create=False):
+        self.status = status
+        self.results_for = results or (lambda slug: 'succeeded')
+        self.crash_after_create = crash_after_create
+        self.created = []
+        self.retrieves = 0
+        self.cancelled = []
+
+    def _batch(self, processing_status):
+        counts = types.SimpleNamespace(processing=len(self.created[-1]), succeeded=0, errored=0,
+                                       canceled=0, expired=0)
+        return types.SimpleNamespace(id='msgbatch_1', processing_status=processing_status,
+                                     request_counts=counts, created_at=self.created_at)
+
+    def create(self, requests):
+        from datetime import datetime
+        self.created.append([r['custom_id'] for r in requests])
+        self.created_at = datetime.now().astimezone()
+        if self.crash_after_create:
+            self.crash_after_create = False
+            raise KeyboardInterrupt     # killed after the API accepted the batch
+        return self._batch('in_progress')
+
+    def list(self, limit=20):
+        return [self._batch('in_progress')] if self.created else []
+
+    def retrieve(self, batch_id):
+        self.retrieves += 1
+        status = self.status(self.retrieves)
+        if isinstance(status, Exception):
+            raise status
+        return self._batch(status)
+
+    def cancel(self, batch_id):
+        self.cancelled.append(batch_id)
+
+    def results(self, batch_id):
+        for slug in self.created[-1]:
+            kind = self.results_for(slug)
+            message = types.SimpleNamespace(content=[types.SimpleNamespace(text=POST_JSON)], usage=None)
+            yield types.SimpleNamespace(custom_id=slug, result=types.SimpleNamespace(type=kind, message=message))
+
+
+def _batch_client(batches):
+    return types.SimpleNamespace(messages=types.SimpleNamespace(batches=batches))
+
+
+def test_batch_saves_posts_and_counts_expired_as_failed(blog):
+    batches = FakeBatches(lambda n: 'ended' if n > 2 else 'in_progress',
+                          results=lambda slug: 'expired' if slug == batches.created[0][1] else 'succeeded')
+
+    assert blog.run_batch(n=3, force=True, client=_batch_client(batches), poll_seconds=0) == 2
+    assert batches.retrieves == 3
+    assert len(_saved(blog)) == 2
+    assert not os.path.exists(blog.BATCH_STATE_FILE)
+
+
+def test_batch_crash_after_submit_resumes_the_same_batch(blog):
+    batches = FakeBatches(lambda n: 'ended', crash_after_create=True)
+    client = _batch_client(batches)
+
+    with pytest.raises(KeyboardInterrupt):
+        blog.run_batch(n=2, force=True, client=client, poll_seconds=0)
+    state = blog._load_batch_state()
+    assert state['batch_id'] is None
+    assert state['slugs'] == batches.created[0]
+    assert state['saved'] == [] and state['failed'] == []
+
+    assert blog.run_batch(n=2, force=True, client=client, poll_seconds=0) == 2
+    assert len(batches.created) == 1          # adopted via list(), not submitted twice
+    assert len(_saved(blog)) == 2
+    assert not os.path.exists(blog.BATCH_STATE_FILE)
+
+
+def test_batch_that_never_ends_is_abandoned(blog, monkeypatch):
+    monkeypatch.setattr(blog, 'BATCH_MAX_HOURS', 0.2 / 3600)
+    batches = FakeBatches(lambda n: 'in_progress')
+
+    with pytest.raises(RuntimeError, match='not ended'):
+        blog.run_batch(n=2, force=True, client=_batch_client(batches), poll_seconds=0.01)
+    assert 1 <= batches.retrieves < 100
+    assert batches.cancelled == ['msgbatch_1']
+    assert not os.path.exists(blog.BATCH_STATE_FILE)
+
+
+def test_batch_abandoned_after_repeated_poll_errors(blog, monkeypatch):
+    monkeypatch.setattr(blog, 'BATCH_POLL_ERRORS', 3)
+    batches = FakeBatches(lambda n: RuntimeError('connection reset'))
+
+    with pytest.raises(RuntimeError, match='3 poll errors'):
+        blog.run_batch(n=2, force=True, client=_batch_client(batches), poll_seconds=0)
+    assert batches.retrieves == 3
+    assert not os.path.exists(blog.BATCH_STATE_FILE)
+
+
+def test_batch_gone_is_abandoned_at_once(blog):
+    batches = FakeBatches(lambda n: _api_error(anthropic.NotFoundError, 404))
+
+    with pytest.raises(RuntimeError, match='abandoned'):
+        blog.run_batch(n=2, force=True, client=_batch_client(batches), poll_seconds=0)
+    assert batches.retrieves == 1
+    assert not os.path.exists(blog.BATCH_STATE_FILE)
+
+
+# ── Post index shared with bulk workers ──────────────────────────────────────
+
+def test_related_posts_while_another_thread_indexes(blog):
+    blog.post_index(refresh=True)
+
+    def post(i):
+        return {"slug": f"post-{i}", "title": f"Post {i}", "published_at": f"2026-10-{i % 28 + 1:02d}"}
+    for i in range(2000):
+        blog._index_post(post(i), mtime=float(i))
+
+    errors = []
+
+    def indexer():
+        for i in range(2000, 6000):
+            blog._index_post(post(i), mtime=float(i))
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)          # switch threads as often as possible
+    thread = threading.Thread(target=indexer)
+    thread.start()
+    try:
+        while thread.is_alive():
+            try:
+                related = blog._build_related('post-0')
+                blog._published_slugs()
+            except RuntimeError as exc:  # dictionary changed size during iteration
+                errors.append(exc)
+                break
+            assert len(related) == 3 and ['post-0', 'Post 0'] not in related
+    finally:
+        thread.join()
+        sys.setswitchinterval(interval)
+    assert errors == []
+    assert len(blog.post_index()) == 6000
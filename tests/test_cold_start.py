@@ -0,0 +1,78 @@
+"""Startup behaviour of a fresh app process: warm template cache, lazy airport data."""
+
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Counts template compiles in a fresh process, from import through one render
+_COMPILES = """
+import json, jinja2
+compiles = []
+_compile = jinja2.Environment.compile
+def counting(self, source, name=None, *args, **kwargs):
+    compiles.append(name)
+    return _compile(self, source, name, *args, **kwargs)
+jinja2.Environment.compile = counting
+
+import app
+at_import = list(compiles)
+with app.app.test_request_context('/', base_url='https://localhost'):
+    app.render_template('about.html')
+cache = app.app.jinja_env.bytecode_cache
+print(json.dumps({
+    'at_import': at_import,
+    'after_render': compiles[len(at_import):],
+    'cache_dir': cache.directory,
+    'templates': app.app.jinja_env.list_templates(extensions=['html']),
+}))
+"""
+
+# Airport data is built on first use, once per OurAirports load
+_AIRPORT_DATA = """
+import json
+import app
+state = {'oa_loaded': app._OA_CACHE['loaded'], 'dataset_built': bool(app._AIRPORT_DATASET['raw'])}
+fake = {'all': [{'code': 'LHR', 'label': 'Heathrow', 'city': 'London', 'country': 'GB',
+                 'type': 'large_airport'}], 'fetched_at': 1.0}
+app._load_ourairports = lambda: fake
+builds = []
+_compress = app.gzip.compress
+app.gzip.compress = lambda *a, **k: builds.append(1) or _compress(*a, **k)
+first = app._get_airport_dataset()['version']
+second = app._get_airport_dataset()['version']
+state.update(builds=len(builds), same_version=first == second)
+fake['fetched_at'] = 2.0
+app._get_airport_dataset()
+state['builds_after_reload'] = len(builds)
+print(json.dumps(state))
+"""
+
+
+def _run(script: str) -> dict:
+    out = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True,
+                         timeout=120, env={**os.environ, 'FLASK_ENV': 'production'})
+    assert out.returncode == 0, out.stderr
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_templates_precompiled_and_cached_on_disk():
+    _run(_COMPILES)            # warms the bytecode cache, whatever state it was in
+    warm = _run(_COMPILES)
+
+    assert os.path.realpath(warm['cache_dir']) == os.path.realpath(os.path.join(ROOT, 'data', '.jinja_cache'))
+    cached = os.listdir(warm['cache_dir'])
+    assert len([f for f in cached if f.endswith('.cache')]) >= len(warm['templates'])
+    # A second process loads every template from bytecode, and requests compile nothing
+    assert warm['at_import'] == []
+    assert warm['after_render'] == []
+
+
+def test_airport_dataset_is_lazy_and_built_once():
+    state = _run(_AIRPORT_DATA)
+    assert state['oa_loaded'] is False
+    assert state['dataset_built'] is False
+    assert state['builds'] == 1 and state['same_version']
+    assert state['builds_after_reload'] == 2
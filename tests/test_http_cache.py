@@ -0,0 +1,108 @@
+"""HTTP caching of the JSON APIs: ETags, 304s and the work they skip."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module, '_get_airport_dataset', lambda: {'version': 'test-v1'})
+    monkeypatch.setattr(app_module, '_JSON_BYTES_CACHE', {})
+    return app_module.app.test_client()
+
+
+def _counting(monkeypatch, name, result):
+    calls = []
+
+    def _fn(*args, **kwargs):
+        calls.append(args)
+        return result
+    monkeypatch.setattr(app_module, name, _fn)
+    return calls
+
+
+def _search_recorder(monkeypatch, results):
+    calls = []
+
+    def _search(q, country):
+        calls.append((q, country))
+        return results
+    monkeypatch.setattr(app_module, '_search_airports', _search)
+    return calls
+
+
+def test_conditional_request_skips_search(client, monkeypatch):
+    calls = _search_recorder(monkeypatch, [{'code': 'LHR'}])
+    first = client.get('/api/airports?country=GB', base_url='https://localhost')
+    assert first.status_code == 200
+    assert first.cache_control.public and first.cache_control.max_age == app_module.AIRPORTS_API_MAX_AGE
+    etag, _ = first.get_etag()
+    assert calls == [('', 'GB')]
+
+    again = client.get('/api/airports?country=GB', base_url='https://localhost',
+                       headers={'If-None-Match': f'"{etag}"'})
+    assert again.status_code == 304
+    assert calls == [('', 'GB')]
+
+
+def test_amadeus_backed_answers_are_etagged_by_body(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'amadeus', object())
+    results = [{'code': 'LHR'}]
+    calls = _search_recorder(monkeypatch, results)
+
+    first = client.get('/api/airports?query=lon', base_url='https://localhost')
+    assert first.cache_control.max_age == app_module.AIRPORTS_LIVE_MAX_AGE
+    etag, _ = first.get_etag()
+
+    # Same query, different answer (e.g. Amadeus down, fallback served): new ETag
+    results[:] = [{'code': 'LGW'}]
+    second = client.get('/api/airports?query=lon', base_url='https://localhost',
+                        headers={'If-None-Match': f'"{etag}"'})
+    assert second.status_code == 200
+    assert second.get_etag()[0] != etag
+    assert len(calls) == 2
+    assert not app_module._JSON_BYTES_CACHE
+
+
+def test_live_deals_conditional_request_skips_fare_fetch(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'API_TOKEN', 'test-token')
+    monkeypatch.setattr(app_module, '_live_deals_cache', {})
+    monkeypatch.setattr(app_module, '_load_ourairports', lambda: {'by_country': {}})
+    monkeypatch.setattr(app_module, '_get_airport_index',
+                        lambda: {'BCN': {'city': 'Barcelona', 'country': 'ES'}})
+    depart = (datetime.utcnow().date() + timedelta(days=3)).isoformat()
+    fetches = _counting(monkeypatch, '_fetch_latest_prices',
+                        [{'destination': 'BCN', 'value': 49, 'depart_date': depart}])
+
+    first = client.get('/api/live-deals?country=GB', base_url='https://localhost')
+    assert first.status_code == 200 and first.get_json()
+    etag, _ = first.get_etag()
+    fetched = len(fetches)
+    assert fetched > 0
+
+    again = client.get('/api/live-deals?country=GB', base_url='https://localhost',
+                       headers={'If-None-Match': f'"{etag}"'})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert len(fetches) == fetched
+
+
+def test_geo_conditional_request_keeps_vary(client, monkeypatch):
+    lookups = _counting(monkeypatch, '_load_ourairports', {'by_country': {'FR': [{'code': 'CDG'}]}})
+    headers = {app_module.GEO_COUNTRY_HEADER: 'FR'}
+
+    first = client.get('/api/geo', base_url='https://localhost', headers=headers)
+    assert first.status_code == 200 and first.get_json()['top_airport'] == 'CDG'
+    assert first.cache_control.public
+    etag, _ = first.get_etag()
+    assert len(lookups) == 1
+
+    again = client.get('/api/geo', base_url='https://localhost',
+                       headers={**headers, 'If-None-Match': f'"{etag}"'})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert app_module.GEO_COUNTRY_HEADER in again.vary
+    assert len(lookups) == 1
@@ -0,0 +1,51 @@
+"""jobs.enqueue() dedupe against a throwaway queue."""
+
+import pytest
+
+import jobs
+
+
+@pytest.fixture(autouse=True)
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'JOBS_DB', str(tmp_path / 'jobs.db'))
+
+
+def _run(job_id):
+    conn = jobs._connect()
+    try:
+        job = jobs._claim(conn, 'test-worker')
+    finally:
+        conn.close()
+    assert job['id'] == job_id
+    jobs._finish(job_id, 'test-worker', result={'ok': True})
+    assert jobs.get(job_id)['status'] == 'done'
+
+
+def test_pending_and_running_jobs_are_deduped():
+    job_id, created = jobs.enqueue('blog-bulk', {'n': 3})
+    assert created
+    assert jobs.enqueue('blog-bulk', {'n': 3}) == (job_id, False)
+    assert jobs.enqueue('blog-bulk', {'n': 4})[1] is True
+
+    _run(job_id)
+    assert jobs.enqueue('blog-bulk', {'n': 3})[1] is True    # finished: may run again
+
+
+def test_once_job_is_not_requeued_after_it_finished():
+    job_id, created = jobs.enqueue('blog-weekly', {'date': '2026-10-19'}, once=True)
+    assert created
+    _run(job_id)
+
+    assert jobs.enqueue('blog-weekly', {'date': '2026-10-19'}, once=True) == (job_id, False)
+    assert jobs.enqueue('blog-weekly', {'date': '2026-10-26'}, once=True)[1] is True
+    assert len([j for j in jobs.recent() if j['kind'] == 'blog-weekly']) == 2
+
+
+def test_late_scheduler_does_not_rerun_the_weekly_post():
+    import app as app_module
+    app_module._scheduled_blog_run()
+    [job] = jobs.recent()
+    _run(job['id'])
+
+    app_module._scheduled_blog_run()     # another worker's scheduler fires after the run
+    assert [j['id'] for j in jobs.recent()] == [job['id']]
@@ -0,0 +1,60 @@
+"""FastJSONProvider output must parse to what Flask's default provider produces."""
+
+import dataclasses
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+import app as app_module
+
+
+@dataclasses.dataclass
+class _Fare:
+    destination: str
+    price: int
+
+
+SAMPLE = {
+    'fetched_at': datetime(2026, 10, 19, 10, 0, 0),
+    'depart': date(2026, 12, 1),
+    'fare': _Fare('BCN', 49),
+    'id': uuid.UUID(int=1),
+    'price': Decimal('49.50'),
+    'city': 'Málaga',
+    'b': 1,
+    'a': [1, 2.5, None, True],
+}
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def provider(request, monkeypatch):
+    if request.param == 'orjson':
+        if app_module.orjson is None:
+            pytest.skip('orjson not installed')
+    else:
+        monkeypatch.setattr(app_module, 'orjson', None)
+    return app_module.app.json
+
+
+def test_datetimes_are_http_dates(provider):
+    out = json.loads(provider.dumps_bytes(SAMPLE))
+    assert out['fetched_at'] == 'Mon, 19 Oct 2026 10:00:00 GMT'
+    assert out['depart'] == 'Tue, 01 Dec 2026 00:00:00 GMT'
+
+
+def test_matches_default_provider(provider):
+    expected = DefaultJSONProvider(app_module.app).dumps(SAMPLE)
+    assert json.loads(provider.dumps_bytes(SAMPLE)) == json.loads(expected)
+    assert json.loads(provider.dumps(SAMPLE)) == json.loads(expected)
+    assert list(json.loads(provider.dumps_bytes(SAMPLE))) == sorted(SAMPLE)
+
+
+def test_response_body(provider):
+    with app_module.app.test_request_context():
+        response = provider.response(SAMPLE)
+    assert response.mimetype == 'application/json'
+    assert response.get_json()['fetched_at'] == 'Mon, 19 Oct 2026 10:00:00 GMT'
@@ -0,0 +1,61 @@
+"""leases.acquire() raced by real processes against one SQLite file."""
+
+import multiprocessing as mp
+import os
+import time
+
+import pytest
+
+import leases
+
+WORKERS = 6
+
+
+@pytest.fixture(autouse=True)
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / 'leases.db')
+    monkeypatch.setattr(leases, 'LEASES_DB', path)
+    return path
+
+
+def _worker(db_path, name, barrier, released, out):
+    leases.LEASES_DB = db_path
+    barrier.wait()
+    lease = leases.acquire(name, ttl=5)
+    if lease is None:
+        released.wait(10)
+        out.put((os.getpid(), False, leases.last_result(name)))
+        return
+    time.sleep(0.5)     # every other worker tries while this one holds it
+    lease.release({'winner': os.getpid()})
+    released.set()
+    out.put((os.getpid(), True, None))
+
+
+def test_exactly_one_process_wins_and_the_rest_read_its_result(db):
+    ctx = mp.get_context('fork')
+    barrier, released, out = ctx.Barrier(WORKERS), ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(db, 'weekly', barrier, released, out)) for _ in range(WORKERS)]
+    for p in procs:
+        p.start()
+    outcomes = [out.get(timeout=30) for _ in procs]
+    for p in procs:
+        p.join(10)
+
+    winners = [pid for pid, won, _ in outcomes if won]
+    assert len(winners) == 1
+    assert [seen for _, won, seen in outcomes if not won] == [{'winner': winners[0]}] * (WORKERS - 1)
+    assert leases.status('weekly')['held'] is False
+
+
+def test_lease_without_heartbeat_expires_and_is_taken_over():
+    lease = leases.acquire('weekly', ttl=1)
+    lease._stop.set()       # a crashed owner: no heartbeat, no release
+    assert leases.acquire('weekly') is None
+
+    time.sleep(1.1)
+    successor = leases.acquire('weekly', ttl=5)
+    assert successor is not None
+    assert leases.status('weekly')['owner'] == successor.owner != lease.owner
+    successor.release({'ok': True})
+    assert leases.last_result('weekly') == {'ok': True}
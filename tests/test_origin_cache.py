@@ -0,0 +1,75 @@
+"""Shared fare caches under concurrent searches (app._FARE_CACHE_LOCK)."""
+
+import sys
+import threading
+import time
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture(autouse=True)
+def caches(monkeypatch):
+    monkeypatch.setattr(app_module, '_ORIGIN_INDEX', {})
+    monkeypatch.setattr(app_module, '_FLEX_MONTH_CACHE', {})
+    monkeypatch.setattr(app_module, '_FLEX_MATRIX_CACHE', {})
+    monkeypatch.setattr(app_module, 'ORIGIN_INDEX_MAX', 50)
+    monkeypatch.setattr(app_module, '_get_airport_index', lambda: {})
+    monkeypatch.setattr(app_module, '_fetch_latest_prices',
+                        lambda origin, currency, **kw: [{'destination': f'X{origin}', 'value': 10}])
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)   # switch threads as often as possible
+    yield
+    sys.setswitchinterval(interval)
+
+
+def _hammer(fn, threads=8, rounds=200):
+    errors = []
+
+    def _run(t):
+        try:
+            for i in range(rounds):
+                fn(t, i)
+        except Exception as exc:
+            errors.append(exc)
+    workers = [threading.Thread(target=_run, args=(t,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return errors
+
+
+def test_multi_origin_search_keeps_every_origin_while_cache_churns():
+    origins = [f'O{i:02}' for i in range(20)]
+    stop = threading.Event()
+
+    def _churn():
+        while not stop.is_set():
+            for i in range(100):
+                app_module._get_origin_fares(f'C{i:03}', 'gbp')
+            app_module._refresh_origin_index()
+    churner = threading.Thread(target=_churn)
+    churner.start()
+    try:
+        for _ in range(20):
+            merged = app_module._get_multi_origin_fares(
+                origins, lambda code: app_module._get_origin_fares(code, 'gbp', refresh=True), budget=10)
+            assert {f['origin_code'] for f in merged['international']} == set(origins)
+    finally:
+        stop.set()
+        churner.join()
+    assert len(app_module._ORIGIN_INDEX) <= app_module.ORIGIN_INDEX_MAX
+
+
+def test_flex_month_cache_bounded_under_concurrent_inserts():
+    errors = _hammer(lambda t, i: app_module._fetch_month_fares(f'O{t}-{i}', 'gbp', '2026-11'))
+    assert errors == []
+    assert len(app_module._FLEX_MONTH_CACHE) <= 500
+
+
+def test_expired_flex_entries_dropped_on_insert():
+    app_module._FLEX_MONTH_CACHE[('OLD', 'gbp', '2020-01')] = {'fares': [], 'fetched_at': time.time() - 10**6}
+    app_module._fetch_month_fares('LHR', 'gbp', '2026-11')
+    assert ('OLD', 'gbp', '2020-01') not in app_module._FLEX_MONTH_CACHE
@@ -0,0 +1,113 @@
+"""price_alerts.run() against a canned fare source."""
+
+import json
+import time
+
+import pytest
+
+import price_alerts
+import subscribers
+
+
+@pytest.fixture(autouse=True)
+def dbs(tmp_path, monkeypatch):
+    monkeypatch.setattr(subscribers, 'SUBSCRIBERS_DB', str(tmp_path / 'subscribers.db'))
+    monkeypatch.setattr(price_alerts, 'ALERTS_DB', str(tmp_path / 'price_alerts.db'))
+    for email, airport in [('a@example.com', 'LHR'), ('b@example.com', 'LHR'), ('c@example.com', 'MAN')]:
+        subscribers.enqueue(email, airport)
+
+
+class FareSource:
+    """Canned fares per origin; an Exception value is raised instead of returned."""
+
+    def __init__(self, fares):
+        self.fares = fares
+        self.calls = []
+
+    def __call__(self, origin, currency):
+        self.calls.append(origin)
+        result = self.fares.get(origin, [])
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def _fare(dest, price):
+    return {'destination': dest, 'value': price, 'depart_date': '2026-12-01'}
+
+
+def test_drops_become_one_digest_per_subscriber():
+    price_alerts.run(FareSource({'LHR': [_fare('BCN', 100), _fare('LIS', 80)],
+                                 'MAN': [_fare('DUB', 50)]}), run_date='2026-10-01')
+    source = FareSource({'LHR': [_fare('BCN', 60), _fare('BCN', 70), _fare('LIS', 78)],
+                         'MAN': [_fare('DUB', 50)]})
+    stats = price_alerts.run(source, run_date='2026-10-02')
+
+    assert source.calls == ['LHR', 'MAN']
+    assert stats == {'origins': 2, 'fetched': 2, 'failed': 0, 'drops': 1, 'digests': 2}
+    digests = price_alerts.pending_digests()
+    assert sorted(d['email'] for d in digests) == ['a@example.com', 'b@example.com']
+    assert digests[0]['payload']['drops'] == [
+        {'destination': 'BCN', 'old_price': 100, 'new_price': 60, 'pct': 40}]
+
+
+def test_run_date_is_processed_once():
+    source = FareSource({})
+    price_alerts.run(source, run_date='2026-10-01')
+    assert price_alerts.run(source, run_date='2026-10-01') == {'skipped': True}
+    assert len(source.calls) == 2
+
+
+def test_failing_origin_does_not_lose_the_others():
+    price_alerts.run(FareSource({'LHR': [_fare('BCN', 100)], 'MAN': [_fare('DUB', 100)]}),
+                     run_date='2026-10-01')
+    stats = price_alerts.run(FareSource({'LHR': RuntimeError('upstream down'), 'MAN': [_fare('DUB', 50)]}),
+                             run_date='2026-10-02')
+    assert stats['failed'] == 1 and stats['digests'] == 1
+
+    # LHR kept its old snapshot, so the drop is still found on the next run
+    stats = price_alerts.run(FareSource({'LHR': [_fare('BCN', 50)], 'MAN': [_fare('DUB', 50)]}),
+                             run_date='2026-10-03')
+    assert stats['drops'] == 1 and stats['digests'] == 2
+
+
+def test_snapshot_and_digests_commit_together(monkeypatch):
+    price_alerts.run(FareSource({'LHR': [_fare('BCN', 100)]}), run_date='2026-10-01')
+    iter_airport = subscribers.iter_airport
+
+    def _broken_iter(origin, batch=500):
+        raise RuntimeError('subscriber store unavailable')
+    monkeypatch.setattr(subscribers, 'iter_airport', _broken_iter)
+    stats = price_alerts.run(FareSource({'LHR': [_fare('BCN', 50)]}), run_date='2026-10-02')
+    assert stats['failed'] == 1
+    assert price_alerts.pending_digests() == []
+
+    # The snapshot rolled back with the digests, so the drop is found again
+    monkeypatch.setattr(subscribers, 'iter_airport', iter_airport)
+    stats = price_alerts.run(FareSource({'LHR': [_fare('BCN', 50)]}), run_date='2026-10-03')
+    assert stats['drops'] == 1 and stats['digests'] == 2
+
+
+def test_stale_unfinished_claim_is_taken_over():
+    conn = price_alerts._connect()
+    try:
+        conn.execute("INSERT INTO alert_runs (run_date, started_at) VALUES (?, ?)", ('2026-10-01', time.time()))
+    finally:
+        conn.close()
+    assert price_alerts.run(FareSource({}), run_date='2026-10-01') == {'skipped': True}
+
+    conn = price_alerts._connect()
+    try:
+        conn.execute("UPDATE alert_runs SET started_at = ?",
+                     (time.time() - price_alerts.RUN_CLAIM_TTL - 1,))
+    finally:
+        conn.close()
+    stats = price_alerts.run(FareSource({}), run_date='2026-10-01')
+    assert stats['origins'] == 2
+
+    conn = price_alerts._connect()
+    try:
+        row = conn.execute("SELECT finished_at, stats FROM alert_runs WHERE run_date = '2026-10-01'").fetchone()
+    finally:
+        conn.close()
+    assert row['finished_at'] and json.loads(row['stats']) == stats
@@ -0,0 +1,62 @@
+"""Price-per-km ranking (app._rank_by_value) on synthetic fares."""
+
+import math
+import random
+
+import pytest
+
+import app as app_module
+
+N_FARES = 3000
+
+
+@pytest.fixture
+def airports(monkeypatch):
+    rng = random.Random(0)
+    index = {'ORG': {'code': 'ORG', 'lat': 51.47, 'lon': -0.45}}
+    for i in range(500):
+        index[f'D{i:03}'] = {'code': f'D{i:03}', 'lat': rng.uniform(-60, 70), 'lon': rng.uniform(-180, 180)}
+    index['NOP'] = {'code': 'NOP', 'lat': None, 'lon': None}
+    monkeypatch.setattr(app_module, '_get_airport_index', lambda: index)
+    return index
+
+
+def _fares(airports, n=N_FARES):
+    rng = random.Random(1)
+    codes = [c for c, a in airports.items() if a['lat'] is not None and c != 'ORG']
+    return [{'destination_code': rng.choice(codes), 'price': rng.randint(20, 900)} for _ in range(n)]
+
+
+@pytest.mark.parametrize('vectorised', [
+    False,
+    pytest.param(True, marks=pytest.mark.skipif(app_module.np is None, reason='numpy not installed')),
+])
+def test_orders_by_price_per_km(airports, vectorised):
+    fares = _fares(airports) + [{'destination_code': 'NOP', 'price': 5}, {'destination_code': 'ORG', 'price': 1}]
+    ranked = app_module._rank_by_value('ORG', fares, vectorised=vectorised)
+
+    assert len(ranked) == len(fares)
+    per_km = [f['price_per_km'] for f in ranked if 'price_per_km' in f]
+    assert len(per_km) == N_FARES
+    assert per_km == sorted(per_km)
+    # Fares with no coordinates, or to the origin itself, go last in price order
+    assert [f['destination_code'] for f in ranked[N_FARES:]] == ['ORG', 'NOP']
+
+    for f in ranked[:N_FARES]:
+        dest = airports[f['destination_code']]
+        km = app_module._haversine_km(51.47, -0.45, dest['lat'], dest['lon'])
+        assert f['distance_km'] == round(km)
+        assert f['price_per_km'] == round(f['price'] / km, 3)
+
+
+@pytest.mark.skipif(app_module.np is None, reason='numpy not installed')
+def test_numpy_and_python_distances_agree(airports):
+    rng = random.Random(2)
+    coords = [(rng.uniform(-90, 90), rng.uniform(-180, 180), rng.uniform(-90, 90), rng.uniform(-180, 180))
+              for _ in range(N_FARES)]
+    coords += [(10.0, 20.0, 10.0, 20.0), (0.0, 0.0, 0.0, 180.0)]   # zero distance, antipodal
+    lat1, lon1, lat2, lon2 = map(list, zip(*coords))
+
+    fast = app_module._great_circle_km(lat1, lon1, lat2, lon2, vectorised=True)
+    slow = app_module._great_circle_km(lat1, lon1, lat2, lon2, vectorised=False)
+    assert all(math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6) for a, b in zip(fast, slow))